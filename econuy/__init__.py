@@ -1,3 +1,15 @@
-from econuy.session import Session
+import sys
 
 __version__ = "0.13.1"
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # Import the Session (and pandas, SQLAlchemy, etc.) on first access,
+        # so that `import econuy.utils.sqlutil` or reading `__version__`
+        # stays cheap
+        if name == "Session":
+            from econuy.session import Session
+            return Session
+        raise AttributeError(f"module 'econuy' has no attribute '{name}'")
+else:
+    from econuy.session import Session  # noqa: F401
@@ -2,9 +2,10 @@ import datetime as dt
 import re
 import tempfile
 import zipfile
+from functools import partial
 from io import BytesIO
 from os import PathLike, path
-from typing import Union
+from typing import Union, Optional
 from urllib import error
 
 import numpy as np
@@ -16,9 +17,11 @@ from pandas.tseries.offsets import YearEnd
 from requests import exceptions
 from sqlalchemy.engine.base import Connection, Engine
 
-from econuy.utils import ops, metadata
+from econuy.utils import ops, metadata, parallel
 from econuy.utils.lstrings import urls
 
+COMTRADE_RATE = 1
+
 
 @retry(
     retry_on_exceptions=(exceptions.HTTPError, exceptions.ConnectionError),
@@ -30,7 +33,9 @@ def _weights(update_loc: Union[str, PathLike, Engine,
              revise_rows: Union[str, int] = "nodup",
              save_loc: Union[str, PathLike, Engine,
                              Connection, None] = None,
-             only_get: bool = True) -> pd.DataFrame:
+             only_get: bool = True,
+             incremental: bool = False,
+             max_workers: int = 4) -> pd.DataFrame:
     """Get commodity export weights for Uruguay.
 
     Parameters
@@ -54,6 +59,13 @@ def _weights(update_loc: Union[str, PathLike, Engine,
     only_get : bool, default True
         If True, don't download data, retrieve what is available from
         ``update_loc``.
+    incremental : bool, default False
+        If True and ``update_loc`` holds previous weights, only request the
+        years not already present (plus the two previous years needed for
+        the 3-year rolling average) from Comtrade.
+    max_workers : int, default 4
+        Number of years downloaded concurrently. Requests share one pooled
+        HTTP session and are spaced to respect Comtrade's guest rate limit.
 
     Returns
     -------
@@ -68,14 +80,28 @@ def _weights(update_loc: Union[str, PathLike, Engine,
         if not output.equals(pd.DataFrame()):
             return output
 
-    base_url = "http://comtrade.un.org/api/get?max=1000&type=C&freq=A&px=S3&ps"
-    prods = "%2C".join(["0011", "011", "01251", "01252", "0176", "022", "041",
-                        "042", "043", "2222", "24", "25", "268", "97"])
-    raw = []
-    for year in range(1992, dt.datetime.now().year - 1):
-        full_url = f"{base_url}={year}&r=all&p=858&rg=1&cc={prods}"
-        un_r = requests.get(full_url)
-        raw.append(pd.DataFrame(un_r.json()["dataset"]))
+    previous_data = pd.DataFrame()
+    if update_loc is not None:
+        previous_data = ops._io(operation="update",
+                                data_loc=update_loc,
+                                name=name, multiindex=False)
+
+    first_year = 1992
+    last_year = dt.datetime.now().year - 2
+    last_stored = None
+    if incremental is True and not previous_data.dropna(how="all").empty:
+        last_stored = pd.to_datetime(previous_data.dropna(how="all")
+                                     .index.max())
+        if last_stored.year >= last_year:
+            return previous_data
+        first_year = max(first_year, last_stored.year - 1)
+
+    session = parallel._http_session(pool_size=max_workers)
+    limiter = parallel._RateLimiter(calls_per_second=COMTRADE_RATE)
+    fetch_year = partial(_weights_year, session=session, limiter=limiter)
+    with session:
+        raw = parallel._map(fetch_year, range(first_year, last_year + 1),
+                            executor="thread", max_workers=max_workers)
     raw = pd.concat(raw, axis=0)
 
     table = raw.groupby(["period", "cmdDescE"]).sum().reset_index()
@@ -98,9 +124,8 @@ def _weights(update_loc: Union[str, PathLike, Engine,
                       "Rice", "Soybeans", "Wheat", "Wool", "Beef"]
 
     if update_loc is not None:
-        previous_data = ops._io(operation="update",
-                                data_loc=update_loc,
-                                name=name)
+        if last_stored is not None:
+            output = output.loc[output.index > last_stored]
         output = ops._revise(new_data=output, prev_data=previous_data,
                              revise_rows=revise_rows)
 
@@ -111,6 +136,24 @@ def _weights(update_loc: Union[str, PathLike, Engine,
     return output
 
 
+@retry(
+    retry_on_exceptions=(exceptions.HTTPError, exceptions.ConnectionError),
+    max_calls_total=4,
+    retry_window_after_first_call_in_seconds=90,
+)
+def _weights_year(year: int, session: requests.Session,
+                  limiter: parallel._RateLimiter) -> pd.DataFrame:
+    """Get Uruguay's exports of relevant commodities for a single year."""
+    base_url = "http://comtrade.un.org/api/get?max=1000&type=C&freq=A&px=S3&ps"
+    prods = "%2C".join(["0011", "011", "01251", "01252", "0176", "022", "041",
+                        "042", "043", "2222", "24", "25", "268", "97"])
+    full_url = f"{base_url}={year}&r=all&p=858&rg=1&cc={prods}"
+    limiter.wait()
+    un_r = session.get(full_url)
+    un_r.raise_for_status()
+    return pd.DataFrame(un_r.json()["dataset"])
+
+
 @retry(
     retry_on_exceptions=(error.HTTPError, error.URLError,
                          exceptions.HTTPError, exceptions.ConnectionError),
@@ -120,9 +163,14 @@ def _weights(update_loc: Union[str, PathLike, Engine,
 def _prices(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
             revise_rows: Union[str, int] = "nodup",
             save_loc: Union[str, PathLike, Engine, Connection, None] = None,
-            only_get: bool = True) -> pd.DataFrame:
+            only_get: bool = True,
+            max_workers: Optional[int] = None) -> pd.DataFrame:
     """Get commodity prices for Uruguay.
 
+    Each source is downloaded as an independent task and all tasks run
+    concurrently, so total time is bounded by the slowest source. The time
+    taken by each source is logged to the ``econuy.utils.parallel`` logger.
+
     Parameters
     ----------
     update_loc : str, os.PathLike, SQLAlchemy Connection or Engine, or None, \
@@ -144,6 +192,9 @@ def _prices(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
     only_get : bool, default True
         If True, don't download data, retrieve what is available from
         ``update_loc``.
+    max_workers : int or None, default None
+        Number of sources downloaded concurrently. If ``None``, use the
+        :mod:`concurrent.futures` default.
 
     Returns
     -------
@@ -161,7 +212,66 @@ def _prices(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
             return output
 
     url = urls["commodity_index"]["dl"]
-    raw_beef = (pd.read_excel(url["beef"], header=4, index_col=0)
+    tasks = {"beef": partial(_beef, url["beef"]),
+             "pulp": partial(_pulp, url["pulp"]),
+             "soybean": partial(_cbot, url["soybean"], bushel_conv),
+             "wheat": partial(_cbot, url["wheat"], bushel_conv),
+             "milk_oceania": partial(_milk_oceania, url["milk1"]),
+             "milk_eu": partial(_milk_eu, url["milk2"]),
+             "eurusd": _eurusd,
+             "imf": partial(_imf, url["imf"])}
+    sources = parallel._run_tasks(tasks, max_workers=max_workers)
+    beef = sources["beef"]
+    pulp = sources["pulp"]
+    soybean = sources["soybean"]
+    wheat = sources["wheat"]
+
+    proc_milk = sources["milk_oceania"]
+    prev_milk = sources["milk_eu"]
+    eurusd = sources["eurusd"].reindex(prev_milk.index)
+    prev_milk = prev_milk.divide(eurusd.values).multiply(10)
+    prev_milk = prev_milk.loc[prev_milk.index < min(proc_milk.index)]
+    prev_milk.columns, proc_milk.columns = ["Price"], ["Price"]
+    milk = prev_milk.append(proc_milk)
+
+    proc_imf = sources["imf"]
+    rice = proc_imf[proc_imf.columns[proc_imf.columns.str.contains("Rice")]]
+    wood = proc_imf[proc_imf.columns[
+        proc_imf.columns.str.contains("Sawnwood")
+    ]]
+    wood = wood.mean(axis=1).to_frame()
+    wool = proc_imf[proc_imf.columns[proc_imf.columns.str.startswith("Wool")]]
+    wool = wool.mean(axis=1).to_frame()
+    barley = proc_imf[proc_imf.columns[
+        proc_imf.columns.str.startswith("Barley")
+    ]]
+    gold = proc_imf[proc_imf.columns[
+        proc_imf.columns.str.startswith("Gold")
+    ]]
+
+    complete = pd.concat([beef, pulp, soybean, milk, rice, wood, wool, barley,
+                          gold, wheat], axis=1)
+    complete = complete.reindex(beef.index).dropna(thresh=8)
+    complete.columns = ["Beef", "Pulp", "Soybeans", "Milk", "Rice", "Wood",
+                        "Wool", "Barley", "Gold", "Wheat"]
+
+    if update_loc is not None:
+        previous_data = ops._io(operation="update",
+                                data_loc=update_loc,
+                                name=name)
+        complete = ops._revise(new_data=complete, prev_data=previous_data,
+                               revise_rows=revise_rows)
+
+    if save_loc is not None:
+        ops._io(operation="save", data_loc=save_loc,
+                data=complete, name=name)
+
+    return complete
+
+
+def _beef(url: str) -> pd.DataFrame:
+    """Get monthly beef prices from INAC."""
+    raw_beef = (pd.read_excel(url, header=4, index_col=0)
                 .dropna(how="all"))
     raw_beef.columns = raw_beef.columns.str.strip()
     proc_beef = raw_beef["Ing. Prom./Ton."].to_frame()
@@ -172,9 +282,12 @@ def _prices(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
         proc_beef / 1000,
         proc_beef,
     )
-    beef = proc_beef.resample("M").mean()
+    return proc_beef.resample("M").mean()
 
-    raw_pulp_r = requests.get(url["pulp"])
+
+def _pulp(url: str) -> pd.DataFrame:
+    """Get monthly pulp prices from the zipped Statistics Finland file."""
+    raw_pulp_r = requests.get(url)
     temp_dir = tempfile.TemporaryDirectory()
     with zipfile.ZipFile(BytesIO(raw_pulp_r.content), "r") as f:
         f.extractall(path=temp_dir.name)
@@ -184,19 +297,21 @@ def _prices(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
     proc_pulp.index = pd.date_range(start="1990-01-31",
                                     periods=len(proc_pulp), freq="M")
     proc_pulp.drop(["Label", "Codes"], axis=1, inplace=True)
-    pulp = proc_pulp
-
-    soy_wheat = []
-    for link in [url["soybean"], url["wheat"]]:
-        raw = pd.read_csv(link, index_col=0)
-        proc = (raw["Settle"] * bushel_conv).to_frame()
-        proc.index = pd.to_datetime(proc.index, format="%Y-%m-%d")
-        proc.sort_index(inplace=True)
-        soy_wheat.append(proc.resample("M").mean())
-    soybean = soy_wheat[0]
-    wheat = soy_wheat[1]
-
-    milk_r = requests.get(url["milk1"])
+    return proc_pulp
+
+
+def _cbot(url: str, bushel_conv: float) -> pd.DataFrame:
+    """Get monthly average settle prices for a CBOT futures contract."""
+    raw = pd.read_csv(url, index_col=0)
+    proc = (raw["Settle"] * bushel_conv).to_frame()
+    proc.index = pd.to_datetime(proc.index, format="%Y-%m-%d")
+    proc.sort_index(inplace=True)
+    return proc.resample("M").mean()
+
+
+def _milk_oceania(url: str) -> pd.DataFrame:
+    """Get monthly Oceania milk prices from INALE."""
+    milk_r = requests.get(url)
     milk_soup = BeautifulSoup(milk_r.content, "html.parser")
     links = milk_soup.find_all(href=re.compile("Oceanía"))
     xls = links[0]["href"]
@@ -210,11 +325,18 @@ def _prices(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
     proc_milk.sort_values(by=["Año/Mes", "variable"], inplace=True)
     proc_milk.index = pd.date_range(start="2007-01-31",
                                     periods=len(proc_milk), freq="M")
-    proc_milk = proc_milk.iloc[:, 2].to_frame()
+    return proc_milk.iloc[:, 2].to_frame()
+
 
-    prev_milk = pd.read_excel(url["milk2"], sheet_name="Dairy Products Prices",
+def _milk_eu(url: str) -> pd.DataFrame:
+    """Get monthly EU dairy prices in euros, used before 2007."""
+    prev_milk = pd.read_excel(url, sheet_name="Dairy Products Prices",
                               index_col=0, usecols="A,D", skiprows=5)
-    prev_milk = prev_milk.resample("M").mean()
+    return prev_milk.resample("M").mean()
+
+
+def _eurusd() -> pd.DataFrame:
+    """Get the monthly EUR/USD exchange rate."""
     eurusd_r = requests.get(
         "http://fx.sauder.ubc.ca/cgi/fxdata",
         params=f"b=USD&c=EUR&rd=&fd=1&fm=1&fy=2001&ld=31&lm=12&ly="
@@ -223,56 +345,25 @@ def _prices(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
     eurusd = pd.read_html(eurusd_r.content)[0].drop("MMM YYYY", axis=1)
     eurusd.index = pd.date_range(start="2001-01-31", periods=len(eurusd),
                                  freq="M")
-    eurusd = eurusd.reindex(prev_milk.index)
-    prev_milk = prev_milk.divide(eurusd.values).multiply(10)
-    prev_milk = prev_milk.loc[prev_milk.index < min(proc_milk.index)]
-    prev_milk.columns, proc_milk.columns = ["Price"], ["Price"]
-    milk = prev_milk.append(proc_milk)
+    return eurusd
+
 
-    raw_imf = pd.read_excel(url["imf"])
+def _imf(url: str) -> pd.DataFrame:
+    """Get the IMF primary commodity prices sheet."""
+    raw_imf = pd.read_excel(url)
     raw_imf.columns = raw_imf.iloc[0, :]
     proc_imf = raw_imf.iloc[3:, 1:]
     proc_imf.index = pd.date_range(start="1980-01-31",
                                    periods=len(proc_imf), freq="M")
-    rice = proc_imf[proc_imf.columns[proc_imf.columns.str.contains("Rice")]]
-    wood = proc_imf[proc_imf.columns[
-        proc_imf.columns.str.contains("Sawnwood")
-    ]]
-    wood = wood.mean(axis=1).to_frame()
-    wool = proc_imf[proc_imf.columns[proc_imf.columns.str.startswith("Wool")]]
-    wool = wool.mean(axis=1).to_frame()
-    barley = proc_imf[proc_imf.columns[
-        proc_imf.columns.str.startswith("Barley")
-    ]]
-    gold = proc_imf[proc_imf.columns[
-        proc_imf.columns.str.startswith("Gold")
-    ]]
-
-    complete = pd.concat([beef, pulp, soybean, milk, rice, wood, wool, barley,
-                          gold, wheat], axis=1)
-    complete = complete.reindex(beef.index).dropna(thresh=8)
-    complete.columns = ["Beef", "Pulp", "Soybeans", "Milk", "Rice", "Wood",
-                        "Wool", "Barley", "Gold", "Wheat"]
-
-    if update_loc is not None:
-        previous_data = ops._io(operation="update",
-                                data_loc=update_loc,
-                                name=name)
-        complete = ops._revise(new_data=complete, prev_data=previous_data,
-                               revise_rows=revise_rows)
-
-    if save_loc is not None:
-        ops._io(operation="save", data_loc=save_loc,
-                data=complete, name=name)
-
-    return complete
+    return proc_imf
 
 
 def get(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
         save_loc: Union[str, PathLike, Engine, Connection, None] = None,
         name: str = "commodity_index", index_label: str = "index",
         only_get: bool = False, only_get_prices: bool = False,
-        only_get_weights: bool = True) -> pd.DataFrame:
+        only_get_weights: bool = True, incremental_weights: bool = False,
+        max_workers: int = 4) -> pd.DataFrame:
     """Get export-weighted commodity price index for Uruguay.
 
     Parameters
@@ -301,6 +392,12 @@ def get(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
     only_get_weights : bool, default True
         If True, don't download data, retrieve what is available from
         ``update_loc`` for commodity weights.
+    incremental_weights : bool, default False
+        If True and ``update_loc`` holds previous weights, only request the
+        years not already present (plus the two previous years needed for
+        the 3-year rolling average) from Comtrade.
+    max_workers : int, default 4
+        Number of Comtrade years downloaded concurrently.
 
     Returns
     -------
@@ -319,7 +416,9 @@ def get(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
     prices = prices.interpolate(method="linear", limit=1).dropna(how="any")
     prices = prices.pct_change(periods=1)
     weights = _weights(update_loc=update_loc, revise_rows="nodup",
-                       save_loc=save_loc, only_get=only_get_weights)
+                       save_loc=save_loc, only_get=only_get_weights,
+                       incremental=incremental_weights,
+                       max_workers=max_workers)
     weights = weights[prices.columns]
     weights = weights.reindex(prices.index, method="ffill")
 
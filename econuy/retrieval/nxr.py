@@ -1,6 +1,6 @@
 import datetime as dt
 from os import PathLike
-from typing import Union
+from typing import List, Optional, Tuple, Union
 from urllib.error import URLError, HTTPError
 
 import pandas as pd
@@ -8,7 +8,7 @@ from opnieuw import retry
 from pandas.tseries.offsets import MonthEnd
 from sqlalchemy.engine.base import Connection, Engine
 
-from econuy.utils import ops, metadata
+from econuy.utils import ops, metadata, parallel
 from econuy.utils.lstrings import urls
 
 
@@ -104,7 +104,8 @@ def get_daily(update_loc: Union[str, PathLike,
                               Engine, Connection, None] = None,
               name: str = "nxr_daily",
               index_label: str = "index",
-              only_get: bool = False) -> pd.DataFrame:
+              only_get: bool = False,
+              max_workers: int = 8) -> pd.DataFrame:
     """Get daily nominal exchange rate data.
 
     Parameters
@@ -127,6 +128,8 @@ def get_daily(update_loc: Union[str, PathLike,
     only_get : bool, default False
         If True, don't download data, retrieve what is available from
         ``update_loc``.
+    max_workers : int, default 8
+        Number of 30-day windows downloaded concurrently.
 
     Returns
     -------
@@ -152,28 +155,16 @@ def get_daily(update_loc: Union[str, PathLike,
             pass
 
     today = dt.datetime.now() - dt.timedelta(days=1)
-    runs = (today - start_date).days // 30
-    data = []
     base_url = urls['nxr_daily']['dl']['main']
-    if runs > 0:
-        for i in range(1, runs + 1):
-            from_ = (start_date + dt.timedelta(days=1)).strftime('%d/%m/%Y')
-            to_ = (start_date + dt.timedelta(days=30)).strftime('%d/%m/%Y')
-            dates = f"%22FechaDesde%22:%22{from_}%22,%22FechaHasta%22:%22{to_}"
-            url = f"{base_url}{dates}%22,%22Grupo%22:%222%22}}" + "}"
-            try:
-                data.append(pd.read_excel(url))
-                start_date = dt.datetime.strptime(to_, '%d/%m/%Y')
-            except TypeError:
-                pass
-    from_ = (start_date + dt.timedelta(days=1)).strftime('%d/%m/%Y')
-    to_ = (dt.datetime.now() - dt.timedelta(days=1)).strftime('%d/%m/%Y')
-    dates = f"%22FechaDesde%22:%22{from_}%22,%22FechaHasta%22:%22{to_}"
-    url = f"{base_url}{dates}%22,%22Grupo%22:%222%22}}" + "}"
-    try:
-        data.append(pd.read_excel(url))
-    except TypeError:
-        pass
+    links = []
+    for from_, to_ in _windows(start=start_date, end=today):
+        from_ = from_.strftime('%d/%m/%Y')
+        to_ = to_.strftime('%d/%m/%Y')
+        dates = f"%22FechaDesde%22:%22{from_}%22,%22FechaHasta%22:%22{to_}"
+        links.append(f"{base_url}{dates}%22,%22Grupo%22:%222%22}}" + "}")
+    data = parallel._map(_read_window, links, executor="thread",
+                         max_workers=max_workers)
+    data = [window for window in data if window is not None]
     try:
         output = pd.concat(data, axis=0)
         output = output.pivot(index="Fecha", columns="Moneda",
@@ -202,3 +193,30 @@ def get_daily(update_loc: Union[str, PathLike,
             return previous_data
 
     return output
+
+
+def _windows(start: dt.datetime,
+             end: dt.datetime) -> List[Tuple[dt.datetime, dt.datetime]]:
+    """Split the days after ``start`` up to ``end`` into contiguous windows
+    of at most 30 days."""
+    windows = []
+    while (end - start).days >= 30:
+        windows.append((start + dt.timedelta(days=1),
+                        start + dt.timedelta(days=30)))
+        start = start + dt.timedelta(days=30)
+    if start + dt.timedelta(days=1) <= end:
+        windows.append((start + dt.timedelta(days=1), end))
+    return windows
+
+
+@retry(
+    retry_on_exceptions=(HTTPError, URLError),
+    max_calls_total=4,
+    retry_window_after_first_call_in_seconds=30,
+)
+def _read_window(url: str) -> Optional[pd.DataFrame]:
+    """Download a single window of daily exchange rates."""
+    try:
+        return pd.read_excel(url)
+    except TypeError:
+        return None
@@ -1,7 +1,7 @@
 import datetime as dt
 import urllib
 from os import PathLike
-from typing import Union
+from typing import Union, Optional, List, Tuple
 from urllib.error import URLError, HTTPError
 
 import pandas as pd
@@ -9,9 +9,11 @@ from dateutil.relativedelta import relativedelta
 from opnieuw import retry
 from sqlalchemy.engine.base import Connection, Engine
 
-from econuy.utils import metadata, ops
+from econuy.utils import metadata, ops, parallel
 from econuy.utils.lstrings import urls, reserves_cols
 
+REVISABLE_MONTHS = 1
+
 
 @retry(
     retry_on_exceptions=(HTTPError, URLError),
@@ -24,9 +26,14 @@ def get_changes(update_loc: Union[str, PathLike, Engine,
                                 Connection, None] = None,
                 name: str = "reserves_chg",
                 index_label: str = "index",
-                only_get: bool = False) -> pd.DataFrame:
+                only_get: bool = False,
+                max_workers: Optional[int] = 4) -> pd.DataFrame:
     """Get international reserves change data.
 
+    When previous data is available only the months after the last stored
+    date, plus the last ``REVISABLE_MONTHS`` complete months that may still
+    be revised, are downloaded. Monthly files are fetched concurrently.
+
     Parameters
     ----------
     update_loc : str, os.PathLike, SQLAlchemy Connection or Engine, or None, \
@@ -47,6 +54,8 @@ def get_changes(update_loc: Union[str, PathLike, Engine,
     only_get : bool, default False
         If True, don't download data, retrieve what is available from
         ``update_loc``.
+    max_workers : int or None, default 4
+        Number of monthly files downloaded concurrently.
 
     Returns
     -------
@@ -59,18 +68,7 @@ def get_changes(update_loc: Union[str, PathLike, Engine,
         if not output.equals(pd.DataFrame()):
             return output
 
-    months = ["ene", "feb", "mar", "abr", "may", "jun",
-              "jul", "ago", "set", "oct", "nov", "dic"]
-    years = list(range(2013, dt.datetime.now().year + 1))
-    files = [month + str(year) for year in years for month in months]
-    first_dates = list(pd.date_range(start="2013-01-01",
-                                     periods=len(files), freq="MS"))
-    url = urls["reserves_chg"]["dl"]["main"]
-    links = [f"{url}{file}.xls" for file in files]
-    wrong_may14 = f"{url}may2014.xls"
-    fixed_may14 = f"{url}mayo2014.xls"
-    links = [fixed_may14 if x == wrong_may14 else x for x in links]
-
+    start = dt.datetime(2013, 1, 1)
     if update_loc is not None:
         previous_data = ops._io(operation="update",
                                 data_loc=update_loc,
@@ -81,36 +79,19 @@ def get_changes(update_loc: Union[str, PathLike, Engine,
             previous_data.columns = reserves_cols[1:46]
             previous_data.index = (pd.to_datetime(previous_data.index)
                                    .normalize())
-            links = links[-18:]
-            first_dates = first_dates[-18:]
-
-    reports = []
-    for link, first_day in zip(links, first_dates):
-        try:
-            raw = pd.read_excel(link, sheet_name="ACTIVOS DE RESERVA",
-                                skiprows=3)
-            last_day = (first_day
-                        + relativedelta(months=1)
-                        - dt.timedelta(days=1))
-            proc = raw.dropna(axis=0, thresh=20).dropna(axis=1, thresh=20)
-            proc = proc.transpose()
-            proc.index.name = "Date"
-            proc = proc.iloc[:, 1:46]
-            proc.columns = reserves_cols[1:46]
-            proc = proc.iloc[1:]
-            proc.index = (pd.to_datetime(proc.index, errors="coerce")
-                          .normalize())
-            proc = proc.loc[proc.index.dropna()]
-            proc = proc.loc[first_day:last_day]
-            reports.append(proc)
-
-        except urllib.error.HTTPError:
-            print(f"{link} could not be reached.")
-            pass
-
-    mar14 = pd.read_excel(urls["reserves_chg"]["dl"]["missing"], index_col=0)
-    mar14.columns = reserves_cols[1:46]
-    reserves = pd.concat(reports + [mar14], sort=False).sort_index()
+            start = _first_revisable(previous_data.index.max())
+
+    months = _months(start=start, end=dt.datetime.now())
+    reports = parallel._map(_read_month, months, executor="thread",
+                            max_workers=max_workers)
+    reports = [report for report in reports if report is not None]
+
+    if start <= dt.datetime(2014, 3, 1):
+        mar14 = pd.read_excel(urls["reserves_chg"]["dl"]["missing"],
+                              index_col=0)
+        mar14.columns = reserves_cols[1:46]
+        reports.append(mar14)
+    reserves = pd.concat(reports, sort=False).sort_index()
 
     if update_loc is not None:
         reserves = previous_data.append(reserves, sort=False)
@@ -127,3 +108,52 @@ def get_changes(update_loc: Union[str, PathLike, Engine,
                 data=reserves, name=name, index_label=index_label)
 
     return reserves
+
+
+def _first_revisable(last_date: pd.Timestamp) -> dt.datetime:
+    """Return the first day of the earliest month that has to be downloaded
+    again given the last stored date."""
+    last_month = dt.datetime(last_date.year, last_date.month, 1)
+    return last_month - relativedelta(months=REVISABLE_MONTHS)
+
+
+def _months(start: dt.datetime,
+            end: dt.datetime) -> List[Tuple[str, pd.Timestamp]]:
+    """Build download links and first days for every month between
+    ``start`` and ``end``."""
+    months = ["ene", "feb", "mar", "abr", "may", "jun",
+              "jul", "ago", "set", "oct", "nov", "dic"]
+    url = urls["reserves_chg"]["dl"]["main"]
+    first_dates = pd.date_range(start=dt.datetime(start.year, start.month, 1),
+                                end=end, freq="MS")
+    links = []
+    for first_day in first_dates:
+        file = f"{months[first_day.month - 1]}{first_day.year}"
+        if file == "may2014":
+            file = "mayo2014"
+        links.append((f"{url}{file}.xls", first_day))
+    return links
+
+
+def _read_month(item: Tuple[str, pd.Timestamp]) -> Optional[pd.DataFrame]:
+    """Download and parse a single monthly reserves file."""
+    link, first_day = item
+    try:
+        raw = pd.read_excel(link, sheet_name="ACTIVOS DE RESERVA",
+                            skiprows=3)
+    except urllib.error.HTTPError:
+        print(f"{link} could not be reached.")
+        return None
+    last_day = (first_day
+                + relativedelta(months=1)
+                - dt.timedelta(days=1))
+    proc = raw.dropna(axis=0, thresh=20).dropna(axis=1, thresh=20)
+    proc = proc.transpose()
+    proc.index.name = "Date"
+    proc = proc.iloc[:, 1:46]
+    proc.columns = reserves_cols[1:46]
+    proc = proc.iloc[1:]
+    proc.index = (pd.to_datetime(proc.index, errors="coerce")
+                  .normalize())
+    proc = proc.loc[proc.index.dropna()]
+    return proc.loc[first_day:last_day]
@@ -1,5 +1,7 @@
 import datetime as dt
 import re
+from functools import partial
+from io import BytesIO
 from os import PathLike
 from typing import Union
 from urllib import error
@@ -16,7 +18,7 @@ from sqlalchemy.engine.base import Connection, Engine
 
 from econuy import transform
 from econuy.retrieval import cpi, nxr
-from econuy.utils import ops, metadata
+from econuy.utils import ops, metadata, parallel
 from econuy.utils.lstrings import urls
 
 
@@ -119,6 +121,9 @@ def get_custom(update_loc: Union[str, PathLike, Engine,
                only_get: bool = False) -> pd.DataFrame:
     """Get official real exchange rates from the BCU website.
 
+    The six IMF series and the three Argentina sources are downloaded
+    concurrently over a single keep-alive HTTP session.
+
     Parameters
     ----------
     update_loc : str, os.PathLike, SQLAlchemy Connection or Engine, or None, \
@@ -158,33 +163,23 @@ def get_custom(update_loc: Union[str, PathLike, Engine,
         if not output.equals(pd.DataFrame()):
             return output
 
-    url_ = "http://dataservices.imf.org/REST/SDMX_JSON.svc/CompactData/IFS/M."
-    url_extra = ".?startPeriod=1970&endPeriod="
-    raw = []
-    for country in ["US", "BR", "AR"]:
-        for indicator in ["PCPI_IX", "ENDA_XDC_USD_RATE"]:
-            base_url = (f"{url_}{country}.{indicator}{url_extra}"
-                        f"{dt.datetime.now().year}")
-            r_json = requests.get(base_url).json()
-            data = r_json["CompactData"]["DataSet"]["Series"]["Obs"]
-            try:
-                data = pd.DataFrame(data)
-                data.set_index("@TIME_PERIOD", drop=True, inplace=True)
-            except ValueError:
-                data = pd.DataFrame(np.nan,
-                                    index=pd.date_range(start="1970-01-01",
-                                                        end=dt.datetime.now(),
-                                                        freq="M"),
-                                    columns=[f"{country}.{indicator}"])
-            if "@OBS_STATUS" in data.columns:
-                data.drop("@OBS_STATUS", inplace=True, axis=1)
-            data.index = (pd.to_datetime(data.index, format="%Y-%m")
-                          + MonthEnd(1))
-            data.columns = [f"{country}.{indicator}"]
-            raw.append(data)
+    imf_keys = [(country, indicator) for country in ["US", "BR", "AR"]
+                for indicator in ["PCPI_IX", "ENDA_XDC_USD_RATE"]]
+    with parallel._http_session(pool_size=len(imf_keys) + 3) as session:
+        tasks = {f"{country}.{indicator}": partial(_imf_series, country,
+                                                   indicator, session)
+                 for country, indicator in imf_keys}
+        tasks.update({"ar_black_xr": partial(_ar_black_xr, session),
+                      "ar_cpi": partial(_ar_cpi, session),
+                      "ar_cpi_black": partial(_ar_cpi_black, session)})
+        sources = parallel._run_tasks(tasks, max_workers=len(tasks))
+    raw = [sources[f"{country}.{indicator}"]
+           for country, indicator in imf_keys]
     raw = pd.concat(raw, axis=1, sort=True).apply(pd.to_numeric)
 
-    ar_black_xr, ar_cpi = _missing_ar()
+    ar_black_xr = sources["ar_black_xr"]
+    ar_cpi = _missing_ar_cpi(cpi_ar=sources["ar_cpi"],
+                             cpi_ps=sources["ar_cpi_black"])
     proc = raw.copy()
     proc["AR.PCPI_IX"] = ar_cpi
     ar_black_xr = pd.concat([ar_black_xr, proc["AR.ENDA_XDC_USD_RATE"]],
@@ -249,42 +244,97 @@ def get_custom(update_loc: Union[str, PathLike, Engine,
 
 @retry(
     retry_on_exceptions=(exceptions.HTTPError, exceptions.ConnectionError,
-                         error.HTTPError, error.URLError),
+                         JSONDecodeError),
+    max_calls_total=4,
+    retry_window_after_first_call_in_seconds=60,
+)
+def _imf_series(country: str, indicator: str,
+                session: requests.Session) -> pd.DataFrame:
+    """Get a monthly IFS series from the IMF SDMX endpoint."""
+    url_ = "http://dataservices.imf.org/REST/SDMX_JSON.svc/CompactData/IFS/M."
+    url_extra = ".?startPeriod=1970&endPeriod="
+    base_url = (f"{url_}{country}.{indicator}{url_extra}"
+                f"{dt.datetime.now().year}")
+    imf_r = session.get(base_url)
+    imf_r.raise_for_status()
+    r_json = imf_r.json()
+    data = r_json["CompactData"]["DataSet"]["Series"]["Obs"]
+    try:
+        data = pd.DataFrame(data)
+        data.set_index("@TIME_PERIOD", drop=True, inplace=True)
+    except ValueError:
+        data = pd.DataFrame(np.nan,
+                            index=pd.date_range(start="1970-01-01",
+                                                end=dt.datetime.now(),
+                                                freq="M"),
+                            columns=[f"{country}.{indicator}"])
+    if "@OBS_STATUS" in data.columns:
+        data.drop("@OBS_STATUS", inplace=True, axis=1)
+    data.index = (pd.to_datetime(data.index, format="%Y-%m")
+                  + MonthEnd(1))
+    data.columns = [f"{country}.{indicator}"]
+    return data
+
+
+@retry(
+    retry_on_exceptions=(exceptions.HTTPError, exceptions.ConnectionError),
     max_calls_total=4,
     retry_window_after_first_call_in_seconds=60,
 )
-def _missing_ar():
-    """Get Argentina's non-official exchange rate and CPI."""
-    black_r = requests.get(urls["rxr_custom"]["dl"]["ar_black"]).json()
-    black_xr = pd.DataFrame(black_r)
+def _ar_black_xr(session: requests.Session) -> pd.DataFrame:
+    """Get Argentina's monthly non-official exchange rate."""
+    black_r = session.get(urls["rxr_custom"]["dl"]["ar_black"])
+    black_r.raise_for_status()
+    black_xr = pd.DataFrame(black_r.json())
     black_xr.set_index(0, drop=True, inplace=True)
     black_xr.drop("Fecha", inplace=True)
     black_xr = black_xr.replace(",", ".", regex=True).apply(pd.to_numeric)
     black_xr.index = pd.to_datetime(black_xr.index, format="%d-%m-%Y")
     black_xr = black_xr.mean(axis=1).to_frame().sort_index()
-    black_xr = black_xr.resample("M").mean()
+    return black_xr.resample("M").mean()
+
 
-    cpi_r = requests.get(urls["rxr_custom"]["dl"]["ar_cpi"],
-                         params=urls["rxr_custom"]["dl"]["ar_cpi_payload"])
+@retry(
+    retry_on_exceptions=(exceptions.HTTPError, exceptions.ConnectionError),
+    max_calls_total=4,
+    retry_window_after_first_call_in_seconds=60,
+)
+def _ar_cpi(session: requests.Session) -> pd.DataFrame:
+    """Get Argentina's monthly inflation from an alternative source."""
+    cpi_r = session.get(urls["rxr_custom"]["dl"]["ar_cpi"],
+                        params=urls["rxr_custom"]["dl"]["ar_cpi_payload"])
+    cpi_r.raise_for_status()
     cpi_ar = pd.read_html(cpi_r.content)[0]
     cpi_ar.set_index("Fecha", drop=True, inplace=True)
     cpi_ar.index = pd.to_datetime(cpi_ar.index, format="%d/%m/%Y")
     cpi_ar.columns = ["nivel"]
-    cpi_ar = cpi_ar.divide(10)
+    return cpi_ar.divide(10)
+
 
-    ps_url = urls["rxr_custom"]["dl"]["inf_black"]
-    cpi_ps = pd.read_excel(ps_url)
+@retry(
+    retry_on_exceptions=(exceptions.HTTPError, exceptions.ConnectionError),
+    max_calls_total=4,
+    retry_window_after_first_call_in_seconds=60,
+)
+def _ar_cpi_black(session: requests.Session) -> pd.DataFrame:
+    """Get Argentina's monthly inflation for 2007-2016."""
+    ps_r = session.get(urls["rxr_custom"]["dl"]["inf_black"])
+    ps_r.raise_for_status()
+    cpi_ps = pd.read_excel(BytesIO(ps_r.content))
     cpi_ps.set_index("date", drop=True, inplace=True)
     cpi_ps.index = cpi_ps.index + MonthEnd(1)
     cpi_ps = cpi_ps.loc[(cpi_ps.index >= "2006-12-31") &
                         (cpi_ps.index <= "2016-12-01"), "index"]
     cpi_ps = cpi_ps.to_frame().pct_change(periods=1).multiply(100)
     cpi_ps.columns = ["nivel"]
+    return cpi_ps
 
+
+def _missing_ar_cpi(cpi_ar: pd.DataFrame,
+                    cpi_ps: pd.DataFrame) -> pd.DataFrame:
+    """Chain Argentina's inflation sources into a single CPI index."""
     cpi_all = (cpi_ar.append(cpi_ps).reset_index().
                drop_duplicates(subset="index", keep="last").
                set_index("index", drop=True).sort_index())
 
-    cpi_all = cpi_all.divide(100).add(1).cumprod()
-
-    return black_xr, cpi_all
+    return cpi_all.divide(100).add(1).cumprod()
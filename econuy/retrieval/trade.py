@@ -1,13 +1,15 @@
+from io import BytesIO
 from os import PathLike
-from typing import Union, Dict
+from typing import Union, Dict, Optional, Tuple
 from urllib.error import URLError, HTTPError
+from urllib.request import urlopen
 
 import pandas as pd
 from opnieuw import retry
 from pandas.tseries.offsets import MonthEnd
 from sqlalchemy.engine.base import Connection, Engine
 
-from econuy.utils import ops, metadata
+from econuy.utils import ops, metadata, parallel
 from econuy.utils.lstrings import trade_metadata
 
 
@@ -20,7 +22,8 @@ def get(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
         revise_rows: Union[str, int] = "nodup",
         save_loc: Union[str, PathLike, Engine, Connection, None] = None,
         name: str = "tb", index_label: str = "index",
-        only_get: bool = False) -> Dict[str, pd.DataFrame]:
+        only_get: bool = False, executor: Optional[str] = None,
+        max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
     """Get trade balance data.
 
     Parameters
@@ -49,6 +52,12 @@ def get(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
     only_get : bool, default False
         If True, don't download data, retrieve what is available from
         ``update_loc``.
+    executor : {None, 'thread', 'process'}, default None
+        If not None, download all workbooks concurrently and parse them
+        with a pool of this type, one workbook per task. ``process`` is
+        usually fastest because sheet parsing is CPU-bound.
+    max_workers : int or None, default None
+        Number of workers used for parsing when ``executor`` is set.
 
     Returns
     -------
@@ -69,25 +78,25 @@ def get(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
         if all(not value.equals(pd.DataFrame()) for value in output.values()):
             return output
 
+    if executor not in ["thread", "process", None]:
+        raise ValueError("'executor' can be 'thread', 'process' or None.")
+
+    if executor is None:
+        parsed = {}
+        for file, meta in trade_metadata.items():
+            xls = pd.ExcelFile(meta["url"])
+            parsed[file] = [_parse_sheet(xls, sheet, file, meta)
+                            for sheet in xls.sheet_names]
+    else:
+        urls = [meta["url"] for meta in trade_metadata.values()]
+        contents = parallel._map(_download, urls, executor="thread",
+                                 max_workers=len(urls))
+        parsed = _parse_workbooks(dict(zip(trade_metadata.keys(), contents)),
+                                  executor=executor, max_workers=max_workers)
+
     output = {}
     for file, meta in trade_metadata.items():
-        xls = pd.ExcelFile(meta["url"])
-        sheets = []
-        for sheet in xls.sheet_names:
-            raw = (pd.read_excel(xls, sheet_name=sheet,
-                                 usecols=meta["cols"],
-                                 index_col=0,
-                                 skiprows=7).dropna(thresh=5).T)
-            raw.index = (pd.to_datetime(raw.index, errors="coerce")
-                         + MonthEnd(0))
-            proc = raw[raw.index.notnull()].dropna(thresh=5, axis=1)
-            if file != "m_sect_val":
-                proc = proc.loc[:, meta["old_colnames"]]
-            else:
-                proc = proc.loc[:, ~(proc == "miles de dólares").any()]
-                proc = proc.drop(columns=["DESTINO ECONÓMICO"])
-            proc.columns = meta["new_colnames"]
-            sheets.append(proc)
+        sheets = parsed[file]
         data = pd.concat(sheets).sort_index()
         data = data.apply(pd.to_numeric, errors="coerce")
         if meta["unit"] == "Millones":
@@ -117,3 +126,59 @@ def get(update_loc: Union[str, PathLike, Engine, Connection, None] = None,
         output.update({f"{name}_{file}": data})
 
     return output
+
+
+@retry(
+    retry_on_exceptions=(HTTPError, URLError),
+    max_calls_total=4,
+    retry_window_after_first_call_in_seconds=60,
+)
+def _download(url: str) -> bytes:
+    """Download a workbook into memory."""
+    with urlopen(url) as response:
+        return response.read()
+
+
+def _parse_workbooks(contents: Dict[str, bytes],
+                     executor: Optional[str] = "process",
+                     max_workers: Optional[int] = None,
+                     meta: Optional[Dict[str, Dict]] = None
+                     ) -> Dict[str, list]:
+    """Parse in-memory workbooks concurrently, one task per workbook.
+
+    Each worker opens its workbook once and parses all of its sheets, so no
+    workbook is loaded more than once. Returns a dict of parsed sheets per
+    workbook, in sheet order.
+
+    """
+    if meta is None:
+        meta = trade_metadata
+    items = [(content, file, meta[file]) for file, content in contents.items()]
+    parsed = parallel._map(_parse_workbook, items, executor=executor,
+                           max_workers=max_workers)
+    return dict(zip(contents.keys(), parsed))
+
+
+def _parse_workbook(item: Tuple[bytes, str, Dict]) -> list:
+    content, file, meta = item
+    xls = pd.ExcelFile(BytesIO(content))
+    return [_parse_sheet(xls, sheet, file, meta) for sheet in xls.sheet_names]
+
+
+def _parse_sheet(xls: pd.ExcelFile, sheet: str, file: str,
+                 meta: Dict) -> pd.DataFrame:
+    """Parse a single sheet of a trade workbook."""
+    raw = (pd.read_excel(xls, sheet_name=sheet,
+                         usecols=meta["cols"],
+                         index_col=0,
+                         skiprows=7).dropna(thresh=5).T)
+    raw.index = (pd.to_datetime(raw.index, errors="coerce")
+                 + MonthEnd(0))
+    proc = raw[raw.index.notnull()].dropna(thresh=5, axis=1)
+    if file != "m_sect_val":
+        proc = proc.loc[:, meta["old_colnames"]]
+    else:
+        proc = proc.loc[:, ~(proc == "miles de dólares").any()]
+        proc = proc.drop(columns=["DESTINO ECONÓMICO"])
+    proc.columns = meta["new_colnames"]
+    return proc
@@ -1,20 +1,19 @@
 import platform
+import threading
 import warnings
+from collections import deque
 from datetime import date, datetime
-from os import PathLike, getcwd, path
+from functools import partial
+from os import PathLike, environ, getcwd, path, scandir
 from pathlib import Path
 from typing import Union, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from sqlalchemy.engine.base import Connection, Engine
-from statsmodels.tools.sm_exceptions import X13Error, X13Warning
-from statsmodels.tsa import x13
-from statsmodels.tsa.x13 import x13_arima_analysis as x13a
-from statsmodels.tsa.seasonal import STL, seasonal_decompose
 
 from econuy.retrieval import cpi, national_accounts, nxr
-from econuy.utils import metadata
+from econuy.utils import cache, metadata, ops, parallel
 
 
 def convert_usd(df: pd.DataFrame,
@@ -73,8 +72,9 @@ def convert_usd(df: pd.DataFrame,
             df = df.resample("M").mean()
         inferred_freq = pd.infer_freq(df.index)
 
-    nxr_data = nxr.get_monthly(update_loc=update_loc, save_loc=save_loc,
-                               only_get=only_get)
+    nxr_data = _dependency(nxr.get_monthly, name="nxr_monthly", df=df,
+                           update_loc=update_loc, save_loc=save_loc,
+                           only_get=only_get)
 
     if df.columns.get_level_values("Tipo")[0] == "Stock":
         metadata._set(nxr_data, ts_type="Stock")
@@ -157,8 +157,10 @@ def convert_real(df: pd.DataFrame, start_date: Union[str, date, None] = None,
             df = df.resample("M").mean()
         inferred_freq = pd.infer_freq(df.index)
 
-    cpi_data = cpi.get(update_loc=update_loc, save_loc=save_loc,
-                       only_get=only_get)
+    cpi_data = _dependency(cpi.get, name="cpi", df=df,
+                           update_loc=update_loc, save_loc=save_loc,
+                           only_get=only_get,
+                           extra_dates=[start_date, end_date])
 
     metadata._set(cpi_data, ts_type="Flujo")
     cpi_freq = resample(cpi_data, target=inferred_freq,
@@ -172,10 +174,10 @@ def convert_real(df: pd.DataFrame, start_date: Union[str, date, None] = None,
                                 x / cpi_to_use)
         col_text = "Const."
     elif end_date is None:
+        base = cpi_to_use.index.get_indexer([pd.Timestamp(start_date)],
+                                            method="nearest")[0]
         converted_df = df.apply(
-            lambda x: x / cpi_to_use
-            * cpi_to_use.iloc[df.index.get_loc(start_date,
-                                               method="nearest")])
+            lambda x: x / cpi_to_use * cpi_to_use.iloc[base])
         m_start = datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y-%m")
         col_text = f"Const. {m_start}"
     else:
@@ -252,8 +254,9 @@ def convert_gdp(df: pd.DataFrame,
         return df
 
     inferred_freq = pd.infer_freq(df.index)
-    gdp = national_accounts._lin_gdp(update_loc=update_loc,
-                                     save_loc=save_loc, only_get=only_get)
+    gdp = _dependency(national_accounts._lin_gdp, name="lin_gdp", df=df,
+                      update_loc=update_loc, save_loc=save_loc,
+                      only_get=only_get)
     cum = df.columns.get_level_values("Acum. períodos")[0]
     if inferred_freq in ["M", "MS"]:
         gdp = resample(gdp, target=inferred_freq,
@@ -292,6 +295,30 @@ def convert_gdp(df: pd.DataFrame,
     return converted_df
 
 
+def _dependency(getter, name: str, df: pd.DataFrame,
+                update_loc: Union[str, PathLike, Engine, Connection, None],
+                save_loc: Union[str, PathLike, Engine, Connection, None],
+                only_get: bool, extra_dates=()) -> pd.DataFrame:
+    """Get the slice of a dataset needed to convert ``df``.
+
+    Keep a year of margin on each side of ``df``'s dates for resampling,
+    rolling windows and interpolation. If only stored data is requested,
+    load that slice directly, without reading the whole dataset.
+
+    """
+    dates = [df.index.min(), df.index.max()]
+    dates += [pd.Timestamp(x) for x in extra_dates if x is not None]
+    start = f"{min(dates).year - 1}-01-01"
+    end = f"{max(dates).year + 1}-12-31"
+    if only_get is True and update_loc is not None:
+        data = ops.load(update_loc, name=name, start=start, end=end)
+        if not data.equals(pd.DataFrame()):
+            return data
+    data = getter(update_loc=update_loc, save_loc=save_loc,
+                  only_get=only_get)
+    return data.loc[start:end]
+
+
 def resample(df: pd.DataFrame, target: str, operation: str = "sum",
              interpolation: str = "linear") -> pd.DataFrame:
     """
@@ -387,6 +414,20 @@ def resample(df: pd.DataFrame, target: str, operation: str = "sum",
     return resampled_df
 
 
+ROLLING_PERIODS = {"A": 1,
+                   "A-DEC": 1,
+                   "Q": 4,
+                   "Q-DEC": 4,
+                   "M": 12,
+                   "MS": 12,
+                   "W": 52,
+                   "W-SUN": 52,
+                   "2W": 26,
+                   "2W-SUN": 26,
+                   "B": 260,
+                   "D": 365}
+
+
 def rolling(df: pd.DataFrame, periods: Optional[int] = None,
             operation: str = "sum") -> pd.DataFrame:
     """
@@ -415,19 +456,6 @@ def rolling(df: pd.DataFrame, periods: Optional[int] = None,
         If the input dataframe is a stock time series.
 
     """
-    pd_frequencies = {"A": 1,
-                      "A-DEC": 1,
-                      "Q": 4,
-                      "Q-DEC": 4,
-                      "M": 12,
-                      "MS": 12,
-                      "W": 52,
-                      "W-SUN": 52,
-                      "2W": 26,
-                      "2W-SUN": 26,
-                      "B": 260,
-                      "D": 365}
-
     window_operation = {
         "sum": lambda x: x.rolling(window=periods,
                                    min_periods=periods).sum(),
@@ -441,7 +469,7 @@ def rolling(df: pd.DataFrame, periods: Optional[int] = None,
 
     if periods is None:
         inferred_freq = pd.infer_freq(df.index)
-        periods = pd_frequencies[inferred_freq]
+        periods = ROLLING_PERIODS[inferred_freq]
 
     rolling_df = df.apply(window_operation[operation])
 
@@ -500,7 +528,35 @@ def _new_open_and_read(fname):
     return fout
 
 
-x13._open_and_read = _new_open_and_read
+# Loaded by `_import_statsmodels` on first use, since importing statsmodels
+# takes longer than importing the rest of econuy
+X13Error = None
+X13Warning = None
+x13a = None
+STL = None
+seasonal_decompose = None
+
+
+def _import_statsmodels():
+    """Import statsmodels' decomposition tools into the module namespace,
+    keeping any names that were already set."""
+    from statsmodels.tools import sm_exceptions
+    from statsmodels.tsa import seasonal, x13
+
+    x13._open_and_read = _new_open_and_read
+    loaded = {"X13Error": sm_exceptions.X13Error,
+              "X13Warning": sm_exceptions.X13Warning,
+              "x13a": x13.x13_arima_analysis,
+              "STL": seasonal.STL,
+              "seasonal_decompose": seasonal.seasonal_decompose}
+    for name, value in loaded.items():
+        if globals()[name] is None:
+            globals()[name] = value
+
+
+X13_SEARCH_DEPTH = 6
+_binary_cache = {}
+_binary_lock = threading.Lock()
 
 
 def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
@@ -508,6 +564,9 @@ def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
               outlier: bool = True, trading: bool = True,
               x13_binary: Union[str, PathLike, None] = "search",
               search_parents: int = 1, ignore_warnings: bool = True,
+              executor: Optional[str] = None,
+              max_workers: Optional[int] = None,
+              cache_loc: Union[str, PathLike, None] = None,
               **kwargs) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
     """
     Apply seasonal decomposition.
@@ -536,7 +595,8 @@ def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
         in statsmodels' `x13 arima analysis <https://www.statsmodels.org/dev/
         generated/statsmodels.tsa.x13.x13_arima_analysis.html>`_ for each
         series that fails. If ``False``, jump to the ``fallback`` method for
-        the whole dataframe at the first error.
+        that series at the first error. Each series walks its own retry
+        ladder, so series that succeed are never recomputed.
     fallback : {'loess', 'ma'}
         Decomposition method to fall back to if ``method="x13"`` fails and
         ``force_x13=False``.
@@ -546,13 +606,28 @@ def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
         Whether to automatically detect outliers in X13 ARIMA.
     x13_binary: str, os.PathLike or None, default 'search'
         Location of the X13 binary. If ``search`` is used, will attempt to find
-        the binary in the project structure. If ``None``, Statsmodels will
-        handle it.
+        the binary in the project structure, at most ``X13_SEARCH_DEPTH``
+        directories deep, and remember it for the rest of the process. The
+        ``ECONUY_X13_BINARY`` environment variable overrides the search. If
+        ``None``, Statsmodels will handle it.
     search_parents: int, default 1
         If ``x13_binary=search``, this parameter controls how many parent
         directories to go up before recursively searching for the binary.
     ignore_warnings : bool, default True
         Whether to suppress X13Warnings from statsmodels.
+    executor : {None, 'thread', 'process'}
+        If set, decompose each column as an independent job in a thread or
+        process pool. Results are returned in the original column order.
+    max_workers : int or None, default None
+        Number of workers for ``executor``. If ``None``, use the
+        :mod:`concurrent.futures` default.
+    cache_loc : str, os.PathLike or None, default None
+        Directory where decomposition results are cached, keyed by a hash of
+        each series' values and index plus the decomposition parameters and
+        X13 binary. Unchanged series are read from the cache instead of being
+        recomputed. Series that fall back from X13 or are filled with NaN are
+        not cached. If ``None``, use the ``ECONUY_CACHE_DIR`` environment
+        variable if set, else don't cache. See :mod:`econuy.utils.cache`.
     kwargs
         Keyword arguments passed to statsmodels' ``x13_arima_analysis``,
         ``STL`` and ``seasonal_decompose``.
@@ -573,6 +648,8 @@ def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
         raise ValueError("method can only be 'x13', 'loess' or 'ma'.")
     if fallback not in ["loess", "ma"]:
         raise ValueError("method can only be 'loess' or 'ma'.")
+    if executor not in ["thread", "process", None]:
+        raise ValueError("executor can only be 'thread', 'process' or None.")
 
     df_proc = df.copy()
     old_columns = df_proc.columns
@@ -585,8 +662,8 @@ def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
             search_term = "x13as"
             if platform.system() == "Windows":
                 search_term += ".exe"
-            binary_path = _rsearch(dir_file=getcwd(), n=search_parents,
-                                   search_term=search_term)
+            binary_path = _search_binary(search_term=search_term,
+                                         search_parents=search_parents)
         elif isinstance(x13_binary, str):
             binary_path = x13_binary
         elif isinstance(x13_binary, PathLike):
@@ -601,110 +678,40 @@ def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
                 "Windows and Unix, and how to compile it for "
                 "macOS.")
 
-    if method == "x13":
-        try:
-            with warnings.catch_warnings():
-                if ignore_warnings is True:
-                    action = "ignore"
-                else:
-                    action = "default"
-                warnings.filterwarnings(action=action, category=X13Warning)
-                results = df_proc.apply(
-                    lambda x: x13a(x.dropna(), outlier=outlier,
-                                   trading=trading, x12path=binary_path,
-                                   prefer_x13=True, **kwargs)
-                )
-            trends = results.apply(lambda x: x.trend.reindex(df_proc.index)).T
-            seas_adjs = results.apply(lambda x: x.seasadj.
-                                      reindex(df_proc.index)).T
-
-        except X13Error:
-            if force_x13 is True:
-                if outlier is True:
-                    try:
-                        warnings.warn("X13 error found with selected "
-                                      "parameters. Trying with outlier=False.",
-                                      UserWarning)
-                        return decompose(df=df, method=method,
-                                         outlier=False,
-                                         flavor=flavor, fallback=fallback,
-                                         force_x13=force_x13,
-                                         x13_binary=x13_binary,
-                                         search_parents=search_parents,
-                                         **kwargs)
-                    except X13Error:
-                        try:
-                            warnings.warn("X13 error found with trading=True. "
-                                          "Trying with trading=False.",
-                                          UserWarning)
-                            return decompose(df=df, method=method,
-                                             outlier=False, trading=False,
-                                             flavor=flavor,
-                                             fallback=fallback,
-                                             force_x13=force_x13,
-                                             x13_binary=x13_binary,
-                                             search_parents=search_parents,
-                                             **kwargs)
-                        except X13Error:
-                            warnings.warn("No combination of parameters "
-                                          "successful. Filling with NaN.",
-                                          UserWarning)
-                            trends = pd.DataFrame(
-                                data=np.full(df_proc.shape, np.nan),
-                                index=df_proc.index, columns=df_proc.columns
-                            )
-                            seas_adjs = trends.copy()
-
-                elif trading is True:
-                    try:
-                        warnings.warn("X13 error found with trading=True. "
-                                      "Trying with trading=False...",
-                                      UserWarning)
-                        return decompose(df=df, method=method,
-                                         trading=False, flavor=flavor,
-                                         fallback=fallback,
-                                         force_x13=force_x13,
-                                         x13_binary=x13_binary,
-                                         search_parents=search_parents,
-                                         **kwargs)
-                    except X13Error:
-                        warnings.warn("No combination of parameters "
-                                      "successful. Filling with NaN.",
-                                      UserWarning)
-                        trends = pd.DataFrame(
-                            data=np.full(df_proc.shape, np.nan),
-                            index=df_proc.index, columns=df_proc.columns
-                        )
-                        seas_adjs = trends.copy()
-
-            else:
-                if fallback == "loess":
-                    results = df_proc.apply(
-                        lambda x: STL(x.dropna()).fit(), result_type="expand")
-                elif fallback == "ma":
-                    results = df_proc.apply(
-                        lambda x: seasonal_decompose(
-                            x.dropna(), extrapolate_trend="freq"),
-                        result_type="expand")
-                trends = results.apply(lambda x:
-                                       x.trend.reindex(df_proc.index)).T
-                seas_adjs = results.apply(
-                    lambda x: (x.observed
-                               - x.seasonal).reindex(df_proc.index)).T
-
-    else:
-        if method == "loess":
-            results = df_proc.apply(
-                lambda x: STL(x.dropna()).fit(), result_type="expand")
-        if method == "ma":
-            results = df_proc.apply(
-                lambda x: seasonal_decompose(x.dropna(),
-                                             extrapolate_trend="freq"),
-                result_type="expand")
-        trends = results.apply(lambda x:
-                               x.trend.reindex(df_proc.index)).T
-        seas_adjs = results.apply(
-            lambda x: (x.observed - x.seasonal).reindex(df_proc.index)).T
+    if not isinstance(binary_path, str):
+        binary_path = None
+    decompose_column = partial(_decompose_series, method=method,
+                               force_x13=force_x13, fallback=fallback,
+                               outlier=outlier, trading=trading,
+                               binary_path=binary_path,
+                               ignore_warnings=ignore_warnings, **kwargs)
+    columns = [df_proc.iloc[:, i] for i in range(len(df_proc.columns))]
+    results = [None] * len(columns)
+
+    if cache_loc is None:
+        cache_loc = environ.get("ECONUY_CACHE_DIR")
+    if cache_loc is not None:
+        keys = [cache._key(column, method=method, force_x13=force_x13,
+                           fallback=fallback, outlier=outlier,
+                           trading=trading, binary_path=binary_path,
+                           **kwargs)
+                for column in columns]
+        for i, key in enumerate(keys):
+            cached = cache.get(cache_loc, key)
+            if cached is not None:
+                results[i] = tuple(x.rename(columns[i].name) for x in cached)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    computed = parallel._map(decompose_column, [columns[i] for i in missing],
+                             executor=executor, max_workers=max_workers)
+    for i, (trend, seas_adj, used) in zip(missing, computed):
+        results[i] = (trend, seas_adj)
+        # Series that fell back or were filled with NaN are not cached, so
+        # they are retried with X13 once the binary works
+        if cache_loc is not None and used == method:
+            cache.put(cache_loc, keys[i], results[i])
+    trends = pd.concat([result[0] for result in results], axis=1)
+    seas_adjs = pd.concat([result[1] for result in results], axis=1)
 
     trends.columns = old_columns
     seas_adjs.columns = old_columns
@@ -721,19 +728,121 @@ def decompose(df: pd.DataFrame, flavor: str = "both", method: str = "x13",
     return output
 
 
-def _rsearch(dir_file: Union[str, PathLike], search_term: str, n: int = 2):
-    """Recursively search for a file starting from the n-parent folder of
-    a supplied path."""
+def _decompose_series(series: pd.Series, method: str, force_x13: bool,
+                      fallback: str, outlier: bool, trading: bool,
+                      binary_path: Optional[str], ignore_warnings: bool,
+                      **kwargs) -> Tuple[pd.Series, pd.Series,
+                                         Optional[str]]:
+    """Decompose a single series, walking its own X13 retry ladder.
+
+    With ``force_x13=True`` the series is retried with ``outlier=False`` and
+    then ``trading=False`` and filled with NaN if every combination fails.
+    Otherwise the series jumps to the ``fallback`` method at the first error.
+    Other series in the same dataframe are not affected. Returns the trend,
+    the seasonally adjusted series and the method actually used, which is
+    None if the series was filled with NaN.
+
+    """
+    _import_statsmodels()
+    if method == "x13":
+        attempts = [(outlier, trading)]
+        if force_x13 is True:
+            if outlier is True:
+                attempts.append((False, trading))
+            if trading is True:
+                attempts.append((False, False))
+        for i, (outlier_, trading_) in enumerate(attempts):
+            try:
+                with warnings.catch_warnings():
+                    if ignore_warnings is True:
+                        action = "ignore"
+                    else:
+                        action = "default"
+                    warnings.filterwarnings(action=action,
+                                            category=X13Warning)
+                    result = x13a(series.dropna(), outlier=outlier_,
+                                  trading=trading_, x12path=binary_path,
+                                  prefer_x13=True, **kwargs)
+                return (result.trend.reindex(series.index),
+                        result.seasadj.reindex(series.index), "x13")
+            except X13Error:
+                if force_x13 is False:
+                    break
+                if i + 1 < len(attempts):
+                    warnings.warn(f"X13 error found for '{series.name}' with "
+                                  f"outlier={outlier_} and "
+                                  f"trading={trading_}. Trying with "
+                                  f"outlier={attempts[i + 1][0]} and "
+                                  f"trading={attempts[i + 1][1]}.",
+                                  UserWarning)
+        if force_x13 is True:
+            warnings.warn(f"No combination of parameters successful for "
+                          f"'{series.name}'. Filling with NaN.", UserWarning)
+            empty = pd.Series(np.nan, index=series.index, name=series.name)
+            return empty, empty.copy(), None
+        method = fallback
+
+    if method == "loess":
+        result = STL(series.dropna()).fit()
+    else:
+        result = seasonal_decompose(series.dropna(), extrapolate_trend="freq")
+    return (result.trend.reindex(series.index),
+            (result.observed - result.seasonal).reindex(series.index), method)
+
+
+def _search_binary(search_term: str, search_parents: int = 1,
+                   max_depth: Optional[int] = X13_SEARCH_DEPTH):
+    """Find the X13 binary, searching the project tree only once per process.
+
+    The ``ECONUY_X13_BINARY`` environment variable takes precedence over the
+    search. Results are cached per starting directory: resolved paths are
+    dropped from the cache if the file disappears, and failed searches are
+    not repeated, so a binary added afterwards has to be passed explicitly
+    or through the environment variable.
+
+    """
+    override = environ.get("ECONUY_X13_BINARY")
+    if override:
+        return override
+    key = (getcwd(), search_parents, search_term, max_depth)
+    with _binary_lock:
+        cached = _binary_cache.get(key)
+        if cached is True or (cached is not None and path.isfile(cached)):
+            return cached
+        _binary_cache.pop(key, None)
+    binary_path = _rsearch(dir_file=getcwd(), n=search_parents,
+                           search_term=search_term, max_depth=max_depth)
+    with _binary_lock:
+        _binary_cache[key] = binary_path
+    return binary_path
+
+
+def _rsearch(dir_file: Union[str, PathLike], search_term: str, n: int = 2,
+             max_depth: Optional[int] = None):
+    """Breadth-first search for a file starting from the n-parent folder of
+    a supplied path, going down at most ``max_depth`` levels and skipping
+    hidden directories."""
     i = 0
     while i < n:
         i += 1
         dir_file = path.dirname(dir_file)
-    try:
-        final_path = ([x for x in Path(dir_file).rglob(search_term)][0]
-                      .absolute().as_posix())
-    except IndexError:
-        final_path = True
-    return final_path
+    queue = deque([(dir_file, 0)])
+    while queue:
+        directory, depth = queue.popleft()
+        try:
+            entries = sorted(scandir(directory), key=lambda x: x.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name == search_term and entry.is_file():
+                return Path(entry.path).absolute().as_posix()
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for entry in entries:
+            if (entry.is_dir(follow_symlinks=False)
+                    and not entry.name.startswith(".")):
+                queue.append((entry.path, depth + 1))
+    return True
 
 
 def chg_diff(df: pd.DataFrame, operation: str = "chg",
@@ -819,3 +928,44 @@ def chg_diff(df: pd.DataFrame, operation: str = "chg",
         output = output.multiply(100)
 
     return output
+
+
+def _rolling_chg_diff(df: pd.DataFrame, periods: Optional[int] = None,
+                      rolling_operation: str = "sum", operation: str = "chg",
+                      period_op: str = "last") -> pd.DataFrame:
+    """Same result as ``chg_diff(rolling(df, periods, rolling_operation),
+    operation, period_op)`` for ``period_op`` 'last' or 'inter', computed on
+    the whole dataframe at once and with a single metadata update."""
+    if period_op not in ["last", "inter"]:
+        raise ValueError("'period_op' can be 'last' or 'inter'.")
+    if df.columns.get_level_values("Tipo")[0] == "Stock":
+        warnings.warn("Rolling operations shouldn't be "
+                      "calculated on stock variables", UserWarning)
+    inferred_freq = pd.infer_freq(df.index)
+    if periods is None:
+        periods = ROLLING_PERIODS[inferred_freq]
+    last_year = {"M": 12, "Q": 4, "Q-DEC": 4, "A": 1, "A-DEC": 1}
+    if inferred_freq not in last_year:
+        raise ValueError("The dataframe needs to have a frequency of M "
+                         "(month end), Q (quarter end) or A (year end)")
+
+    window = df.rolling(window=periods, min_periods=periods)
+    if rolling_operation == "sum":
+        output = window.sum()
+    else:
+        output = window.mean()
+    shift = 1 if period_op == "last" else last_year[inferred_freq]
+    if operation == "chg":
+        output = output.pct_change(periods=shift)
+    else:
+        output = output.diff(periods=shift)
+    units = {"last": {"chg": "% variación", "diff": "Cambio"},
+             "inter": {"chg": "% variación interanual",
+                       "diff": "Cambio interanual"}}
+    metadata._set(output, unit=units[period_op][operation],
+                  cumperiods=periods)
+
+    if operation == "chg":
+        output = output.multiply(100)
+
+    return output
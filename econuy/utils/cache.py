@@ -0,0 +1,179 @@
+import hashlib
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from os import PathLike, makedirs, path, remove, replace, scandir, utime
+from typing import Callable, Union, Optional, Dict
+
+import pandas as pd
+
+MAX_SIZE = 512 * 1024 ** 2
+MAX_DATASETS = 32
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _key(series: pd.Series, **params) -> str:
+    """Hash a series' values and index together with the parameters used to
+    process it."""
+    digest = hashlib.sha256()
+    hashed = pd.util.hash_pandas_object(series, index=True).values
+    digest.update(hashed.tobytes())
+    digest.update(repr(sorted(params.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get(loc: Union[str, PathLike], key: str) -> Optional[object]:
+    """Return the object cached under ``key``, or None if it is missing."""
+    file = path.join(loc, f"{key}.pkl")
+    try:
+        with open(file, "rb") as f:
+            value = pickle.load(f)
+        utime(file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        with _lock:
+            _stats["misses"] += 1
+        return None
+    with _lock:
+        _stats["hits"] += 1
+    return value
+
+
+def put(loc: Union[str, PathLike], key: str, value: object,
+        max_size: int = MAX_SIZE) -> None:
+    """Cache an object under ``key`` and evict the least recently used
+    entries until the cache directory is below ``max_size`` bytes."""
+    makedirs(loc, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=loc, suffix=".tmp",
+                                     delete=False) as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    replace(f.name, path.join(loc, f"{key}.pkl"))
+    _evict(loc, max_size=max_size)
+
+
+def _evict(loc: Union[str, PathLike], max_size: int) -> None:
+    """Remove least recently used entries until total size <= max_size."""
+    entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+               for entry in scandir(loc)
+               if entry.is_file() and entry.name.endswith(".pkl")]
+    total = sum(size for _, size, _ in entries)
+    for _, size, file in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            remove(file)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def info() -> Dict[str, int]:
+    """Return cache hit and miss counters for the current process."""
+    with _lock:
+        return dict(_stats)
+
+
+def clear(loc: Union[str, PathLike, None] = None) -> None:
+    """Reset counters and, if ``loc`` is given, delete its cached entries."""
+    with _lock:
+        _stats["hits"] = 0
+        _stats["misses"] = 0
+    if loc is not None and path.isdir(loc):
+        _evict(loc, max_size=0)
+
+
+class DatasetCache(object):
+    """Least recently used cache of loaded datasets, keyed by dataset name
+    and location.
+
+    While active (see :meth:`activate`), loads through
+    :func:`econuy.utils.ops._io` are served from the cache, and saving a
+    dataset invalidates its entries. Datasets are copied in and out, so
+    callers can modify them freely.
+
+    Parameters
+    ----------
+    max_entries : int, default 32
+        Number of datasets to keep before evicting the least recently used.
+
+    """
+
+    def __init__(self, max_entries: int = MAX_DATASETS):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple,
+            select: Optional[Callable] = None) -> Optional[pd.DataFrame]:
+        """Return a copy of a cached dataset, or None if it is missing.
+
+        If ``select`` is given, it is applied to the cached dataset first so
+        that only the selection is copied.
+
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = self._entries[key]
+        if select is not None:
+            value = select(value)
+        return value.copy()
+
+    def peek(self, key: tuple) -> Optional[pd.DataFrame]:
+        """Return a cached dataset without copying it or counting a hit.
+        The result must not be modified."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: tuple, value: pd.DataFrame) -> None:
+        value = value.copy()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, name: str, location: str) -> None:
+        """Drop every entry for a dataset at a location."""
+        with self._lock:
+            for key in [key for key in self._entries
+                        if key[:2] == (name, location)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @contextmanager
+    def activate(self):
+        """Serve loads from this cache within the block. The cache is
+        cleared if the block raises, since a rolled back save may have left
+        stale entries."""
+        previous = active()
+        _local.datasets = self
+        try:
+            yield self
+        except Exception:
+            self.clear()
+            raise
+        finally:
+            _local.datasets = previous
+
+
+_local = threading.local()
+
+
+def active() -> Optional[DatasetCache]:
+    """Return the dataset cache active in the current thread, if any."""
+    return getattr(_local, "datasets", None)
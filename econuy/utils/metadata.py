@@ -1,6 +1,7 @@
 from typing import Optional, Tuple, List
 import warnings
 
+import numpy as np
 import pandas as pd
 
 from econuy.utils.lstrings import urls
@@ -68,33 +69,35 @@ def _set(
             names=names
         )
     else:
-        arrays = []
-        for level in range(0, 9):
-            arrays.append(list(df.columns.get_level_values(level)))
-
-        arrays[2] = [inferred_freq] * len(df.columns)
-        if area is not None:
-            arrays[1] = [area] * len(df.columns)
-        if currency is not None:
-            arrays[3] = [currency] * len(df.columns)
-        if inf_adj is not None:
-            arrays[4] = [inf_adj] * len(df.columns)
-        if unit is not None:
-            arrays[5] = [unit] * len(df.columns)
-        if seas_adj is not None:
-            arrays[6] = [seas_adj] * len(df.columns)
-        if ts_type is not None:
-            arrays[7] = [ts_type] * len(df.columns)
-        if cumperiods is not None:
-            arrays[8] = [cumperiods] * len(df.columns)
-
-        try:
-            arrays[8] = list(map(int, arrays[8]))
-        except ValueError:
-            pass
-
-        tuples = list(zip(*arrays))
-        df.columns = pd.MultiIndex.from_tuples(tuples, names=names)
+        # Work on codes and levels: overwritten levels become a single value
+        # with all-zero codes, so cost does not grow with Python objects per
+        # column
+        columns = df.columns.remove_unused_levels()
+        levels = list(columns.levels)
+        codes = list(columns.codes)
+        values = {1: area, 2: inferred_freq, 3: currency, 4: inf_adj,
+                  5: unit, 6: seas_adj, 7: ts_type, 8: cumperiods}
+        for level, value in values.items():
+            if value is not None:
+                levels[level] = [value]
+                codes[level] = np.zeros(len(columns), dtype=np.int8)
+        levels[8], codes[8] = _int_level(levels[8], codes[8])
+        df.columns = pd.MultiIndex(levels=levels, codes=codes, names=names,
+                                   verify_integrity=False)
+
+
+def _int_level(level: pd.Index, codes: np.ndarray) -> Tuple[pd.Index,
+                                                             np.ndarray]:
+    """Cast a level's values to int, merging values that become equal.
+    Leave it untouched if any value cannot be cast."""
+    if (codes == -1).any():
+        return level, codes
+    try:
+        values = [int(x) for x in level]
+    except ValueError:
+        return level, codes
+    new_codes, uniques = pd.factorize(values)
+    return pd.Index(uniques), new_codes[codes]
 
 
 def _get_sources(dataset: str,
@@ -1,31 +1,54 @@
+from functools import partial
 from os import path, PathLike, mkdir
 from pathlib import Path
-from typing import Union, Optional
+from typing import Union, Optional, Iterable
 
 import pandas as pd
 from sqlalchemy.engine.base import Connection, Engine
 from sqlalchemy.exc import ProgrammingError, OperationalError
 
-from econuy.utils import metadata, sqlutil
+from econuy.utils import cache, metadata, sqlutil, store
 
 
 def _load(data_loc: Union[str, PathLike,
                           Connection, Engine],
           multiindex=True,
           table_name: Optional[str] = None,
-          index_label: Optional[str] = None):
-    """Load existing data from CSV or SQL."""
+          index_label: Optional[str] = None,
+          cols: Union[str, Iterable[str], None] = None,
+          start: Optional[str] = None,
+          end: Optional[str] = None):
+    """Load existing data from CSV, Parquet, Feather, Arrow or SQL.
+
+    ``cols``, ``start`` and ``end`` restrict the loaded columns and dates.
+    They are pushed down to SQL queries and columnar files. Arrow files are
+    memory-mapped so only the selected slice is materialized. CSVs are read
+    in full and sliced afterwards.
+
+    """
     try:
         if isinstance(data_loc, (Engine, Connection)):
-            if multiindex is True:
+            layout = sqlutil._layout(data_loc, table_name)
+            if layout is None:
+                # Checked upfront so a failed query does not abort the
+                # surrounding transaction
+                raise FileNotFoundError(table_name)
+            if multiindex is True or layout == "long":
                 previous_data = sqlutil.read(con=data_loc,
                                              table_name=table_name,
-                                             index_label=index_label)
+                                             index_label=index_label,
+                                             cols=cols, start_date=start,
+                                             end_date=end)
             else:
                 previous_data = pd.read_sql(sql=table_name,
                                             con=data_loc,
                                             index_col=index_label,
                                             parse_dates=index_label)
+                previous_data = _slice(previous_data, cols=cols,
+                                       start=start, end=end)
+        elif store._suffix_format(data_loc) != "csv":
+            previous_data = store.read(data_loc, cols=cols, start=start,
+                                       end=end)
         else:
             if multiindex is True:
                 previous_data = pd.read_csv(data_loc, index_col=0,
@@ -37,6 +60,8 @@ def _load(data_loc: Union[str, PathLike,
                 previous_data = pd.read_csv(data_loc, index_col=0,
                                             parse_dates=True,
                                             float_precision="high")
+            previous_data = _slice(previous_data, cols=cols,
+                                   start=start, end=end)
     except (ProgrammingError, OperationalError, FileNotFoundError):
         print("Data does not exist. No data will be updated")
         previous_data = pd.DataFrame()
@@ -44,6 +69,64 @@ def _load(data_loc: Union[str, PathLike,
     return previous_data
 
 
+def _slice(df: pd.DataFrame, cols: Union[str, Iterable[str], None] = None,
+           start: Optional[str] = None,
+           end: Optional[str] = None) -> pd.DataFrame:
+    """Select columns by indicator name and rows between two dates."""
+    if cols is not None and not (isinstance(cols, str) and cols == "*"):
+        if isinstance(cols, str):
+            cols = [cols]
+        indicators = df.columns.get_level_values(0)
+        df = df.iloc[:, [i for col in cols
+                         for i, indicator in enumerate(indicators)
+                         if indicator == col]]
+    if start is not None or end is not None:
+        df = df.loc[start:end]
+    return df
+
+
+def load(data_loc: Union[str, PathLike, Connection, Engine],
+         name: str,
+         cols: Union[str, Iterable[str], None] = None,
+         start: Optional[str] = None,
+         end: Optional[str] = None,
+         index_label: str = "index",
+         multiindex: bool = True) -> pd.DataFrame:
+    """Load a stored dataset, optionally restricted to some columns and dates.
+
+    Works the same for every storage backend. Predicates are pushed down to
+    the storage layer where possible: SQL ``WHERE`` clauses and column
+    selection, Parquet row group skipping and Arrow memory-mapped slicing.
+
+    Parameters
+    ----------
+    data_loc : str, os.PathLike, SQLAlchemy Connection or Engine
+        Directory, :class:`~econuy.utils.store.FileStore` or SQLAlchemy
+        connection or engine object where the dataset is stored.
+    name : str
+        Either filename without suffix or table name.
+    cols : str, iterable or None, default None
+        Indicator name(s) to load. By default, load all columns.
+    start : str or None, default None
+        First date to load. Inclusive.
+    end : str or None, default None
+        Last date to load. Inclusive.
+    index_label : str, default 'index'
+        Label for SQL indexes.
+    multiindex : bool, default True
+        Whether the dataset has metadata headers.
+
+    Returns
+    -------
+    Stored dataset : pd.DataFrame
+        Empty dataframe if the dataset does not exist.
+
+    """
+    return _io(operation="update", data_loc=data_loc, name=name,
+               index_label=index_label, multiindex=multiindex,
+               cols=cols, start=start, end=end)
+
+
 def _revise(new_data: pd.DataFrame, prev_data: pd.DataFrame,
             revise_rows: Union[int, str]):
     """Replace n rows of data at the end of a dataframe with new data."""
@@ -86,24 +169,133 @@ def _io(operation: str,
         name: str,
         data: Optional[pd.DataFrame] = None,
         index_label: str = "index",
-        multiindex: bool = True) -> Optional[pd.DataFrame]:
+        multiindex: bool = True,
+        cols: Union[str, Iterable[str], None] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        mode: str = "upsert") -> Optional[pd.DataFrame]:
+    """Load or save a dataset.
+
+    Saves default to ``mode="upsert"``, which keeps stored rows that did not
+    change and only writes rows from the first new or revised date onwards
+    to CSVs and SQL tables. The stored dataset always ends up equal to
+    ``data``: stored rows outside its dates are dropped. If a dataset cache is
+    active and holds the stored dataset, SQL upserts compare against it
+    instead of reading the table again, and only delete and insert by date.
+    CSVs are truncated by line, so they are always compared as read from
+    disk. Columnar files are always rewritten. If the stored columns or
+    metadata differ, the dataset is replaced.
+
+    While a dataset cache is active, loads are served from it if the full
+    dataset is cached. Otherwise ``cols``, ``start`` and ``end`` are pushed
+    down to the storage layer, and only full loads are added to the cache.
+
+    """
+    datasets = cache.active()
     if operation == "update":
         if isinstance(data_loc, (str, PathLike)):
-            full_update_loc = (Path(data_loc) / name).with_suffix(".csv")
+            full_update_loc = _full_path(data_loc, name)
         else:
             full_update_loc = data_loc
-        return _load(full_update_loc, table_name=name,
-                     index_label=index_label, multiindex=multiindex)
+        if datasets is None:
+            return _load(full_update_loc, table_name=name,
+                         index_label=index_label, multiindex=multiindex,
+                         cols=cols, start=start, end=end)
+        key = (name, _location_key(data_loc), index_label, multiindex)
+        loaded = datasets.get(key, select=partial(_slice, cols=cols,
+                                                  start=start, end=end))
+        if loaded is not None:
+            return loaded
+        loaded = _load(full_update_loc, table_name=name,
+                       index_label=index_label, multiindex=multiindex,
+                       cols=cols, start=start, end=end)
+        # Only full loads are cached, so filtered loads keep their pushdown
+        if (cols is None or cols == "*") and start is None and end is None:
+            if not loaded.empty:
+                datasets.put(key, loaded)
+        return loaded
 
     elif operation == "save":
+        if mode not in ["replace", "upsert"]:
+            raise ValueError("'mode' can be 'replace' or 'upsert'.")
+        stored = None
+        if datasets is not None:
+            if mode == "upsert" and isinstance(data_loc, (Connection,
+                                                          Engine)):
+                stored = datasets.peek((name, _location_key(data_loc),
+                                        index_label, multiindex))
+            datasets.invalidate(name, _location_key(data_loc))
         if isinstance(data_loc, (str, PathLike)):
-            full_save_loc = (Path(data_loc) / name).with_suffix(".csv")
+            full_save_loc = _full_path(data_loc, name)
             if not path.exists(path.dirname(full_save_loc)):
                 mkdir(path.dirname(full_save_loc))
-            data.to_csv(full_save_loc)
+            if store._file_format(data_loc) == "csv":
+                if mode == "replace" or not _upsert_csv(data, full_save_loc):
+                    data.to_csv(full_save_loc)
+            else:
+                store.write(data, full_save_loc, index_label=index_label)
         else:
             full_update_loc = data_loc
+            if_exists = "upsert" if mode == "upsert" else "replace"
             sqlutil.df_to_sql(data, name=name,
                               con=full_update_loc,
-                              index_label=index_label)
+                              index_label=index_label,
+                              if_exists=if_exists, stored=stored)
         return
+
+
+def _location_key(data_loc: Union[str, PathLike,
+                                  Connection, Engine]) -> str:
+    """Identify a storage location independently of the connection used."""
+    if isinstance(data_loc, (Connection, Engine)):
+        return str(data_loc.engine.url)
+    return f"{path.abspath(data_loc)}:{store._file_format(data_loc)}"
+
+
+def _upsert_csv(data: pd.DataFrame, file: Union[str, PathLike]) -> bool:
+    """Keep the unchanged leading rows of an existing CSV and rewrite only
+    the rest. Return False if the whole file has to be written instead.
+
+    The file is always compared as read from disk, since truncating it at a
+    row count taken from any other copy could cut it at the wrong line.
+
+    """
+    if (not path.isfile(file) or len(data) == 0
+            or not data.index.is_monotonic_increasing
+            or not isinstance(data.index, pd.DatetimeIndex)):
+        return False
+    header = data.iloc[:0].to_csv()
+    header_lines = header.count("\n")
+    with open(file, "r", newline="") as f:
+        if f.read(len(header)) != header:
+            return False
+    stored = pd.read_csv(file, index_col=0, parse_dates=True,
+                         header=list(range(data.columns.nlevels)),
+                         float_precision="high")
+    if (not isinstance(stored.index, pd.DatetimeIndex)
+            or not stored.index.is_monotonic_increasing):
+        return False
+    # Rows dated before the saved data would outlive the save, so the file
+    # is replaced instead
+    if len(stored) > 0 and stored.index[0] < data.index[0]:
+        return False
+    common = store._common_rows(stored, data)
+    if common == 0:
+        return False
+    if common == len(stored) == len(data):
+        return True
+
+    with open(file, "r+b") as f:
+        for _ in range(header_lines + common):
+            f.readline()
+        f.truncate(f.tell())
+    with open(file, "a", newline="") as f:
+        data.iloc[common:].to_csv(f, header=False)
+    return True
+
+
+def _full_path(data_loc: Union[str, PathLike], name: str) -> Path:
+    """Build the file path for a dataset given the location's file
+    format."""
+    suffix = store.FILE_FORMATS[store._file_format(data_loc)]
+    return (Path(data_loc) / name).with_suffix(suffix)
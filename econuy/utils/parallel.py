@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional
+
+from econuy.utils import cache
+
+logger = logging.getLogger(__name__)
+
+
+def _map(func: Callable, items: Iterable,
+         executor: Optional[str] = None,
+         max_workers: Optional[int] = None) -> List:
+    """Apply a function to every item, optionally through a worker pool.
+
+    Results are returned in the same order as ``items`` regardless of the
+    order in which workers finish. With ``executor=None`` items are processed
+    sequentially in the calling thread.
+
+    """
+    if executor not in ["thread", "process", None]:
+        raise ValueError("'executor' can be 'thread', 'process' or None.")
+    items = list(items)
+    if executor is None or len(items) <= 1:
+        return [func(item) for item in items]
+
+    if executor == "thread":
+        # Worker threads share the caller's active dataset cache
+        func = partial(_with_cache, cache.active(), func)
+        pool = ThreadPoolExecutor
+    else:
+        pool = ProcessPoolExecutor
+    with pool(max_workers=max_workers) as workers:
+        return list(workers.map(func, items))
+
+
+def _with_cache(datasets: Optional[cache.DatasetCache], func: Callable,
+                item):
+    if datasets is None:
+        return func(item)
+    with datasets.activate():
+        return func(item)
+
+
+def _run_tasks(tasks: Dict[str, Callable], executor: Optional[str] = "thread",
+               max_workers: Optional[int] = None) -> Dict[str, object]:
+    """Run independent zero-argument callables and return their results by
+    name, logging how long each one took."""
+    results = _map(_timed, tasks.items(), executor=executor,
+                   max_workers=max_workers)
+    return dict(zip(tasks.keys(), results))
+
+
+def _timed(item):
+    name, task = item
+    start = time.perf_counter()
+    result = task()
+    logger.info(f"Fetched '{name}' in "
+                f"{time.perf_counter() - start:.2f} seconds.")
+    return result
+
+
+class _RateLimiter(object):
+    """Space out calls shared by several threads so that no more than
+    ``calls_per_second`` start each second."""
+
+    def __init__(self, calls_per_second: float):
+        self.interval = 1 / calls_per_second
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+def _http_session(pool_size: int = 10):
+    """Return a requests Session whose connection pool can keep
+    ``pool_size`` keep-alive connections open per host."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,119 @@
+import importlib
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Dataset(NamedTuple):
+    """Description of a dataset available through
+    :class:`~econuy.session.Session`.
+
+    Retrieval modules are only imported when :meth:`fetcher` is called.
+
+    """
+    name: str
+    module: str
+    function: str
+    storage_name: str
+    frequency: str
+    aliases: Tuple[str, ...] = ()
+    dependencies: Tuple[str, ...] = ()
+    revise_rows: bool = True
+    group: str = "get"
+
+    def fetcher(self) -> Callable:
+        """Import and return the function that retrieves the dataset."""
+        return getattr(importlib.import_module(self.module), self.function)
+
+
+DATASETS = [
+    Dataset("cpi", "econuy.retrieval.cpi", "get", "cpi", "M",
+            aliases=("prices",)),
+    Dataset("fiscal", "econuy.retrieval.fiscal_accounts", "get", "fiscal",
+            "M"),
+    Dataset("nxr_monthly", "econuy.retrieval.nxr", "get_monthly",
+            "nxr_monthly", "M", aliases=("nxr_m",)),
+    Dataset("nxr_daily", "econuy.retrieval.nxr", "get_daily", "nxr_daily",
+            "D", aliases=("nxr_d",), revise_rows=False),
+    Dataset("naccounts", "econuy.retrieval.national_accounts", "get",
+            "naccounts", "Q", aliases=("na",)),
+    Dataset("labor", "econuy.retrieval.labor", "get_rates", "labor", "M",
+            aliases=("labour",)),
+    Dataset("wages", "econuy.retrieval.labor", "get_wages", "wages", "M"),
+    Dataset("rxr_custom", "econuy.retrieval.rxr", "get_custom",
+            "rxr_custom", "M", aliases=("rxr-custom",),
+            dependencies=("cpi", "nxr_monthly")),
+    Dataset("rxr_official", "econuy.retrieval.rxr", "get_official",
+            "rxr_official", "M", aliases=("rxr-official",)),
+    Dataset("commodity_index", "econuy.retrieval.commodity_index", "get",
+            "commodity_index", "M", aliases=("comm_index",),
+            revise_rows=False),
+    Dataset("reserves_changes", "econuy.retrieval.reserves", "get_changes",
+            "reserves_chg", "D", aliases=("reserves_chg",),
+            revise_rows=False),
+    Dataset("trade", "econuy.retrieval.trade", "get", "tb", "M"),
+    Dataset("cpi_measures", "econuy.frequent", "cpi_measures", "tfm_prices",
+            "M", aliases=("price_measures",), dependencies=("cpi",),
+            revise_rows=False, group="frequent"),
+    Dataset("fiscal", "econuy.frequent", "fiscal", "tfm_fiscal", "M",
+            dependencies=("fiscal", "nxr_monthly"), revise_rows=False,
+            group="frequent"),
+    Dataset("labor", "econuy.frequent", "labor_rate_people", "tfm_labor",
+            "M", aliases=("labour",), dependencies=("labor",),
+            revise_rows=False, group="frequent"),
+    Dataset("real_wages", "econuy.frequent", "labor_real_wages",
+            "tfm_wages", "M", aliases=("wages",),
+            dependencies=("wages", "cpi"), revise_rows=False,
+            group="frequent"),
+    Dataset("net_trade", "econuy.frequent", "trade_balance", "tfm_tb", "M",
+            dependencies=("trade",), revise_rows=False, group="frequent"),
+    Dataset("tot", "econuy.frequent", "terms_of_trade", "tfm_tot", "M",
+            aliases=("terms_of_trade",), dependencies=("trade",),
+            revise_rows=False, group="frequent")
+]
+
+_lookup: Dict[Tuple[str, str], Dataset] = {
+    (dataset.group, name): dataset for dataset in DATASETS
+    for name in (dataset.name,) + dataset.aliases
+}
+
+
+def lookup(name: str, group: str = "get") -> Dataset:
+    """Return the dataset registered under a name or alias.
+
+    Raises
+    ------
+    ValueError
+        If no dataset is registered under ``name`` in ``group``.
+
+    """
+    try:
+        return _lookup[(group, name)]
+    except KeyError:
+        raise ValueError("Invalid keyword for 'dataset' parameter.")
+
+
+def available(group: Optional[str] = None) -> List[str]:
+    """Return the names of registered datasets, optionally for a single
+    group ('get' or 'frequent'), without duplicates."""
+    return list(dict.fromkeys(dataset.name for dataset in DATASETS
+                              if group is None or dataset.group == group))
+
+
+def _waves(names: Iterable[str]) -> List[List[str]]:
+    """Group ``get`` datasets and their dependencies into lists that only
+    depend on datasets in earlier lists."""
+    levels = {}
+
+    def level(dataset: Dataset) -> int:
+        if dataset.name not in levels:
+            levels[dataset.name] = 1 + max(
+                [level(lookup(dependency)) for dependency
+                 in dataset.dependencies], default=-1
+            )
+        return levels[dataset.name]
+
+    for name in names:
+        level(lookup(name))
+    waves = [[] for _ in range(max(levels.values(), default=-1) + 1)]
+    for name, name_level in levels.items():
+        waves[name_level].append(name)
+    return waves
@@ -1,11 +1,104 @@
+import csv
+import logging
+import threading
+import time
+import weakref
+from contextlib import ExitStack, contextmanager
+from io import StringIO
 from os import PathLike, path, listdir
 from pathlib import Path
 from typing import Union, Optional, Iterable
 
 import pandas as pd
 import sqlalchemy as sqla
-from pandas.errors import ParserError
-from sqlalchemy import select, table, column, and_
+from sqlalchemy import select, table, column, and_, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from econuy.utils import parallel, store
+
+CHUNKSIZE = 1000
+POOL_SIZE = 5
+SQLITE_MAX_VARIABLES = 999
+SERIES_TABLE = "econuy_series"
+OBSERVATIONS_TABLE = "econuy_observations"
+METADATA_NAMES = ["Indicador", "Área", "Frecuencia", "Moneda", "Inf. adj.",
+                  "Unidad", "Seas. Adj.", "Tipo", "Acum. períodos"]
+
+_long_schema = sqla.MetaData()
+_series = sqla.Table(
+    SERIES_TABLE, _long_schema,
+    sqla.Column("series_id", sqla.Integer, primary_key=True),
+    sqla.Column("dataset", sqla.String(255), nullable=False, index=True),
+    sqla.Column("position", sqla.Integer, nullable=False),
+    sqla.Column("levels", sqla.Integer, nullable=False),
+    *[sqla.Column(name, sqla.Text) for name in METADATA_NAMES]
+)
+_observations = sqla.Table(
+    OBSERVATIONS_TABLE, _long_schema,
+    sqla.Column("series_id", sqla.Integer, primary_key=True),
+    sqla.Column("date", sqla.DateTime, primary_key=True),
+    sqla.Column("value", sqla.Float)
+)
+
+logger = logging.getLogger(__name__)
+_locks = weakref.WeakKeyDictionary()
+_locks_lock = threading.Lock()
+
+
+def _engine(url: Union[str, sqla.engine.url.URL],
+            pool_size: int = POOL_SIZE) -> sqla.engine.Engine:
+    """Create an engine that keeps up to ``pool_size`` connections open and
+    checks them before reuse.
+
+    In-memory SQLite databases share a single connection, since each new
+    connection would be a different database, so :func:`_transaction`
+    runs their transactions one at a time. SQLite connections can be
+    used by threads other than the one that opened them.
+
+    """
+    url = sqla.engine.url.make_url(url)
+    if url.get_backend_name() == "sqlite":
+        connect_args = {"check_same_thread": False}
+        if url.database in [None, "", ":memory:"]:
+            return sqla.create_engine(url, poolclass=StaticPool,
+                                      connect_args=connect_args)
+        return sqla.create_engine(url, poolclass=QueuePool,
+                                  pool_size=pool_size, pool_pre_ping=True,
+                                  connect_args=connect_args)
+    return sqla.create_engine(url, pool_size=pool_size, pool_pre_ping=True)
+
+
+@contextmanager
+def _transaction(location):
+    """Yield a single connection for a logical operation, committing its
+    transaction on exit or rolling it back on error.
+
+    Engines check out one pooled connection. Engines whose pool shares a
+    single connection (``StaticPool``) run one transaction at a time, so
+    that one caller's commit or rollback never applies to another's writes.
+    Connections already in a transaction are yielded as is. Anything else
+    (directories or ``None``) is passed through.
+
+    """
+    if isinstance(location, sqla.engine.Engine):
+        with _engine_lock(location), location.begin() as con:
+            yield con
+    elif (isinstance(location, sqla.engine.Connection)
+          and not location.in_transaction()):
+        with location.begin():
+            yield location
+    else:
+        yield location
+
+
+def _engine_lock(engine: sqla.engine.Engine):
+    """Return a lock serializing transactions on engines that share a single
+    connection, or a no-op context manager otherwise."""
+    if not isinstance(engine.pool, StaticPool):
+        return ExitStack()
+    with _locks_lock:
+        return _locks.setdefault(engine, threading.RLock())
 
 
 def read(con: sqla.engine.base.Connection,
@@ -19,7 +112,9 @@ def read(con: sqla.engine.base.Connection,
     Convenience wrapper around `pandas.read_sql_query <https://pandas.pydata.
     org/pandas-docs/stable/reference/api/pandas.read_sql_query.html>`_.
 
-    Deals with multiindex column names.
+    Deals with multiindex column names. Datasets stored in the long layout
+    (see :func:`df_to_sql`) are detected automatically and returned in the
+    same wide shape.
 
     Parameters
     ----------
@@ -56,30 +151,36 @@ def read(con: sqla.engine.base.Connection,
     if command is not None:
         output = pd.read_sql_query(sql=command, con=con,
                                    index_col=index_label, **kwargs)
+    elif _layout(con, table_name) == "long":
+        output = _read_long(con=con, name=table_name, cols=cols,
+                            start_date=start_date, end_date=end_date)
     else:
         if all(v is None for v in [cols, start_date, end_date]):
             output = pd.read_sql(sql=table_name, con=con,
                                  index_col=index_label,
                                  parse_dates=index_label, **kwargs)
         else:
+            if isinstance(cols, str) and cols != "*":
+                cols = [cols]
             if isinstance(cols, Iterable) and not isinstance(cols, str):
                 cols_sql = [column(x) for x in cols]
-                cols_sql.append(column("index"))
-            elif isinstance(cols, str) and cols != "*":
-                cols_sql = column(cols)
-                cols_sql.append(column("index"))
+                cols_sql.append(column(index_label))
             else:
-                cols_sql = "*"
+                cols_sql = [text("*")]
             command = select(cols_sql).select_from(table(table_name))
-            dates = column(index_label)
+            dates = column(index_label, sqla.DateTime)
+            if start_date is not None:
+                start_date = pd.Timestamp(start_date).to_pydatetime()
+            if end_date is not None:
+                end_date = pd.Timestamp(end_date).to_pydatetime()
             if start_date is not None:
                 if end_date is not None:
-                    command = command.where(and_(dates >= f"{start_date}",
-                                                 dates <= f"{end_date}"))
+                    command = command.where(and_(dates >= start_date,
+                                                 dates <= end_date))
                 else:
-                    command = command.where(dates >= f"{start_date}")
+                    command = command.where(dates >= start_date)
             elif end_date is not None:
-                command = command.where(dates <= f"{end_date}")
+                command = command.where(dates <= end_date)
 
             output = pd.read_sql(sql=command, con=con,
                                  index_col=index_label,
@@ -98,37 +199,393 @@ def read(con: sqla.engine.base.Connection,
 
 def df_to_sql(df: pd.DataFrame, name: str,
               con: sqla.engine.base.Connection, if_exists: str = "replace",
-              index_label: str = "index") -> None:
+              index_label: str = "index",
+              chunksize: Optional[int] = CHUNKSIZE,
+              method: Optional[str] = "auto",
+              layout: Optional[str] = None,
+              stored: Optional[pd.DataFrame] = None) -> None:
     """Flatten MultiIndex index columns before creating SQL table
-    from dataframe."""
+    from dataframe.
+
+    With ``layout="wide"`` each dataset is a table whose columns are the
+    indicator names, plus a ``{name}_metadata`` table. With
+    ``layout="long"`` all datasets share a series table
+    (``econuy_series``, one row of metadata per series) and an observations
+    table (``econuy_observations``, keyed on ``series_id`` and ``date``), so
+    single series, date bounded queries are index seeks and adding a series
+    only inserts that series. ``None`` keeps the layout the dataset is
+    already stored in, defaulting to ``wide``.
+
+    With ``if_exists="upsert"``, rows already stored unchanged are kept and
+    only the rows from the first new or revised date onwards are deleted and
+    inserted. Only stored rows from ``df``'s first date onwards are read and
+    compared, and earlier rows are deleted, so the table always ends up
+    equal to ``df``. ``stored`` can hold the table as already loaded by the
+    caller, in which case it is not read again. Falls back to ``replace`` if
+    the table does not exist or its columns or metadata differ.
+
+    ``method="auto"`` bulk loads with ``COPY FROM STDIN`` on PostgreSQL,
+    uses the driver's ``executemany`` on SQLite, where it is fastest, and
+    chunked multi-row ``INSERT`` statements elsewhere. ``method="copy"``
+    falls back to the latter two outside PostgreSQL, ``method="multi"``
+    forces multi-row inserts and ``None`` uses ``executemany``.
+
+    """
+    if method not in ["auto", "copy", "multi", None]:
+        raise ValueError("'method' can be 'auto', 'copy', 'multi' or None.")
+    if layout not in ["wide", "long", None]:
+        raise ValueError("'layout' can be 'wide', 'long' or None.")
+    stored_layout = _layout(con, name)
+    if layout is None:
+        layout = stored_layout or "wide"
+    if layout == "long":
+        if stored_layout == "wide":
+            _drop_wide(con, name)
+        _to_long(df, name=name, con=con, if_exists=if_exists,
+                 chunksize=chunksize, method=method)
+        return
+    if stored_layout == "long":
+        _drop_long(con, name)
+        if_exists = "replace"
+    if if_exists == "upsert":
+        if _upsert(df, name=name, con=con, index_label=index_label,
+                   chunksize=chunksize, method=method, stored=stored):
+            return
+        if_exists = "replace"
+
     data = df.copy()
     if isinstance(data.columns, pd.MultiIndex):
         metadata = data.columns.to_frame(index=False)
-        metadata.to_sql(name=f"{name}_metadata", con=con, if_exists=if_exists)
+        _to_sql(metadata, name=f"{name}_metadata", con=con,
+                if_exists=if_exists, index_label=None,
+                chunksize=chunksize, method=method)
         data.columns = data.columns.get_level_values(level=0)
 
+    _to_sql(data, name=name, con=con, if_exists=if_exists,
+            index_label=index_label, chunksize=chunksize, method=method)
+
+    return
+
+
+def _to_sql(data: pd.DataFrame, name: str, con: sqla.engine.base.Connection,
+            if_exists: str, index_label: Optional[str],
+            chunksize: Optional[int], method: Optional[str]) -> None:
+    """Write a flat dataframe with the chosen insert method and log how long
+    it took."""
+    dialect = con.engine.dialect.name
+    if method == "auto":
+        method = {"postgresql": "copy", "sqlite": None}.get(dialect, "multi")
+    if method == "copy" and dialect != "postgresql":
+        method = None if dialect == "sqlite" else "multi"
+    if method == "copy":
+        insert = _copy_insert
+    else:
+        insert = method
+    if method == "multi" and chunksize is not None and dialect == "sqlite":
+        columns = len(data.columns) + 1
+        chunksize = max(1, min(chunksize, SQLITE_MAX_VARIABLES // columns))
+
+    start = time.perf_counter()
     data.to_sql(name=name, con=con, if_exists=if_exists,
-                index_label=index_label)
+                index_label=index_label, chunksize=chunksize, method=insert)
+    logger.info(f"Wrote {len(data)} rows to '{name}' with "
+                f"'{method or 'executemany'}' in "
+                f"{time.perf_counter() - start:.2f} seconds.")
+
+
+def _copy_insert(table, conn, keys, data_iter) -> None:
+    """Insert rows through PostgreSQL's ``COPY FROM STDIN``.
+
+    Used as the ``method`` argument of ``pd.DataFrame.to_sql``.
+
+    """
+    dbapi_conn = conn.connection
+    with dbapi_conn.cursor() as cur:
+        buffer = StringIO()
+        csv.writer(buffer).writerows(data_iter)
+        buffer.seek(0)
+        columns = ", ".join(f'"{k}"' for k in keys)
+        if table.schema:
+            table_name = f'"{table.schema}"."{table.name}"'
+        else:
+            table_name = f'"{table.name}"'
+        cur.copy_expert(sql=f"COPY {table_name} ({columns}) FROM STDIN "
+                            f"WITH CSV", file=buffer)
+
+
+def _upsert(df: pd.DataFrame, name: str, con: sqla.engine.base.Connection,
+            index_label: str = "index", chunksize: Optional[int] = CHUNKSIZE,
+            method: Optional[str] = "auto",
+            stored: Optional[pd.DataFrame] = None) -> bool:
+    """Write only new or revised rows to an existing table. Return False if
+    the table has to be replaced instead."""
+    if (len(df) == 0 or not df.index.is_monotonic_increasing
+            or not df.index.is_unique
+            or not isinstance(df.index, pd.DatetimeIndex)):
+        return False
+    first = df.index[0].to_pydatetime()
+    dates = column(index_label, sqla.DateTime)
+    try:
+        if isinstance(df.columns, pd.MultiIndex):
+            stored_meta = pd.read_sql(sql=f"{name}_metadata", con=con,
+                                      index_col="index")
+            new_meta = df.columns.to_frame(index=False)
+            if not stored_meta.astype(str).equals(new_meta.astype(str)):
+                return False
+        if stored is None:
+            command = (select([text("*")]).select_from(table(name))
+                       .where(dates >= first))
+            window = pd.read_sql(sql=command, con=con, index_col=index_label,
+                                 parse_dates=index_label)
+        else:
+            window = stored.loc[stored.index >= df.index[0]]
+    except (OperationalError, ProgrammingError, ValueError):
+        return False
+    flat_columns = [str(x) for x in df.columns.get_level_values(level=0)]
+    stored_columns = window.columns.get_level_values(level=0).astype(str)
+    if list(stored_columns) != flat_columns:
+        return False
+    if not window.index.is_monotonic_increasing:
+        return False
+
+    dated = table(name, dates)
+    con.execute(dated.delete().where(dates < first))
+    common = store._common_rows(window, df)
+    if common == len(window) == len(df):
+        return True
+
+    if common > 0:
+        last_common = df.index[common - 1].to_pydatetime()
+        con.execute(dated.delete().where(dates > last_common))
+    else:
+        con.execute(dated.delete().where(dates >= first))
+    data = df.iloc[common:].copy()
+    data.columns = data.columns.get_level_values(level=0)
+    _to_sql(data, name=name, con=con, if_exists="append",
+            index_label=index_label, chunksize=chunksize, method=method)
+
+    return True
+
+
+def _layout(con: sqla.engine.base.Connection,
+            name: Optional[str]) -> Optional[str]:
+    """Return how a dataset is stored: 'wide', 'long' or None if it is not
+    stored."""
+    tables = sqla.inspect(con).get_table_names()
+    if name in tables:
+        return "wide"
+    if SERIES_TABLE in tables:
+        query = (select([_series.c.series_id])
+                 .where(_series.c.dataset == name).limit(1))
+        if con.execute(query).first() is not None:
+            return "long"
+    return None
+
+
+def _series_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Describe each column of a dataframe as a row of the series table."""
+    if isinstance(df.columns, pd.MultiIndex):
+        meta = df.columns.to_frame(index=False)
+        meta.columns = METADATA_NAMES[:len(meta.columns)]
+    else:
+        meta = pd.DataFrame({"Indicador": df.columns})
+    meta = meta.reindex(columns=METADATA_NAMES)
+    meta = meta.where(meta.isnull(), meta.astype(str))
+    meta.insert(0, "levels", df.columns.nlevels)
+    meta.insert(0, "position", range(len(meta)))
+    return meta
+
+
+def _key(row) -> tuple:
+    return tuple(None if pd.isnull(row[name]) else row[name]
+                 for name in ["levels"] + METADATA_NAMES)
+
+
+def _to_long(df: pd.DataFrame, name: str, con: sqla.engine.base.Connection,
+             if_exists: str = "replace", chunksize: Optional[int] = CHUNKSIZE,
+             method: Optional[str] = "auto") -> None:
+    """Write a dataset to the series and observations tables.
+
+    Series are matched to stored ones by their metadata. Unmatched stored
+    series are deleted, new ones are inserted. Unless ``if_exists`` is
+    ``replace``, only observations from each series' first new or revised
+    date onwards are rewritten.
+
+    """
+    _long_schema.create_all(bind=con, checkfirst=True)
+    stored = pd.read_sql(_series.select()
+                         .where(_series.c.dataset == name)
+                         .order_by(_series.c.position), con=con)
+    available = {}
+    for _, row in stored.iterrows():
+        available.setdefault(_key(row), []).append(int(row["series_id"]))
+
+    new_meta = _series_frame(df)
+    ids = []
+    for _, row in new_meta.iterrows():
+        matches = available.get(_key(row), [])
+        ids.append(matches.pop(0) if len(matches) > 0 else None)
+    removed = [x for matches in available.values() for x in matches]
+    for series_id in removed:
+        con.execute(_observations.delete()
+                    .where(_observations.c.series_id == series_id))
+        con.execute(_series.delete().where(_series.c.series_id == series_id))
+
+    matched = [x for x in ids if x is not None]
+    stored_obs = pd.DataFrame(columns=["series_id", "date", "value"])
+    if if_exists != "replace" and len(matched) > 0:
+        stored_obs = pd.read_sql(
+            select([_observations.c.series_id, _observations.c.date,
+                    _observations.c.value])
+            .where(_observations.c.series_id.in_(matched))
+            .order_by(_observations.c.series_id, _observations.c.date),
+            con=con, parse_dates=["date"]
+        )
+    stored_obs = {series_id: obs.set_index("date")[["value"]]
+                  for series_id, obs in stored_obs.groupby("series_id")}
+
+    tails = []
+    for position, (series_id, row) in enumerate(zip(ids, new_meta.to_dict(
+            orient="records"))):
+        values = df.iloc[:, [position]]
+        values.columns = ["value"]
+        if series_id is None:
+            series_id = con.execute(
+                _series.insert().values(dataset=name, **row)
+            ).inserted_primary_key[0]
+            common = 0
+        else:
+            con.execute(_series.update()
+                        .where(_series.c.series_id == series_id)
+                        .values(position=position))
+            common = 0
+            if series_id in stored_obs:
+                common = store._common_rows(stored_obs[series_id], values)
+            if common == len(values) == len(stored_obs.get(series_id, [])):
+                continue
+            delete = _observations.delete().where(
+                _observations.c.series_id == series_id)
+            if common > 0:
+                delete = delete.where(_observations.c.date
+                                      > values.index[common - 1]
+                                      .to_pydatetime())
+            con.execute(delete)
+        tail = values.iloc[common:].copy()
+        tail.insert(0, "series_id", series_id)
+        tails.append(tail)
+
+    if len(tails) > 0:
+        observations = pd.concat(tails)
+        observations.index.name = "date"
+        _to_sql(observations, name=OBSERVATIONS_TABLE, con=con,
+                if_exists="append", index_label="date",
+                chunksize=chunksize, method=method)
 
     return
 
 
+def _read_long(con: sqla.engine.base.Connection, name: str,
+               cols: Union[str, Iterable[str], None] = None,
+               start_date: Optional[str] = None,
+               end_date: Optional[str] = None) -> pd.DataFrame:
+    """Read a dataset from the series and observations tables into the
+    usual wide shape."""
+    series = pd.read_sql(_series.select()
+                         .where(_series.c.dataset == name)
+                         .order_by(_series.c.position), con=con)
+    if isinstance(cols, str) and cols != "*":
+        cols = [cols]
+    if isinstance(cols, Iterable) and not isinstance(cols, str):
+        series = series.loc[series["Indicador"].isin(cols)]
+        series = series.set_index("Indicador").loc[cols].reset_index()
+    ids = [int(x) for x in series["series_id"]]
+
+    dates = _observations.c.date
+    query = (select([dates, _observations.c.series_id,
+                     _observations.c.value])
+             .where(_observations.c.series_id.in_(ids)))
+    if start_date is not None:
+        query = query.where(dates >= pd.Timestamp(start_date).to_pydatetime())
+    if end_date is not None:
+        query = query.where(dates <= pd.Timestamp(end_date).to_pydatetime())
+    observations = pd.read_sql(query, con=con, parse_dates=["date"])
+    output = (observations.pivot(index="date", columns="series_id",
+                                 values="value")
+              .reindex(columns=ids).sort_index())
+    output.index = pd.DatetimeIndex(output.index)
+    output.rename_axis(None, inplace=True)
+
+    if len(series) > 0 and series["levels"].iloc[0] > 1:
+        meta = series[METADATA_NAMES].copy()
+        cum = pd.to_numeric(meta["Acum. períodos"], errors="coerce")
+        if cum.notnull().all():
+            meta["Acum. períodos"] = cum.astype(int)
+        output.columns = pd.MultiIndex.from_frame(meta)
+    else:
+        output.columns = list(series["Indicador"])
+
+    return output
+
+
+def _drop_wide(con: sqla.engine.base.Connection, name: str) -> None:
+    for table_name in [name, f"{name}_metadata"]:
+        sqla.Table(table_name, sqla.MetaData()).drop(bind=con,
+                                                     checkfirst=True)
+
+
+def _drop_long(con: sqla.engine.base.Connection, name: str) -> None:
+    ids = select([_series.c.series_id]).where(_series.c.dataset == name)
+    con.execute(_observations.delete()
+                .where(_observations.c.series_id.in_(ids)))
+    con.execute(_series.delete().where(_series.c.dataset == name))
+
+
 def insert_csvs(con: sqla.engine.base.Connection,
-                directory: Union[str, Path, PathLike]) -> None:
-    """Insert all CSV files in data directory into a SQL database."""
+                directory: Union[str, Path, PathLike],
+                layout: Optional[str] = None,
+                executor: Optional[str] = "thread",
+                max_workers: Optional[int] = None) -> None:
+    """Insert all CSV files in data directory into a SQL database, using the
+    given :func:`df_to_sql` layout.
+
+    Files are parsed concurrently by ``executor`` ({'thread', 'process',
+    None}) with ``max_workers`` workers, and written in a single transaction
+    with the bulk insert path. Each file's header format is detected from its
+    first line, so every file is parsed only once. Per-file throughput is
+    logged.
+
+    """
     if path.isfile(directory):
         directory = path.dirname(directory)
-    for file in [x for x in listdir(directory) if x.endswith(".csv")]:
-        full_path = Path(directory) / file
-        try:
-            data = pd.read_csv(full_path, index_col=0,
-                               header=list(range(9)), float_precision="high",
-                               parse_dates=True)
-        except ParserError:
-            data = pd.read_csv(full_path, index_col=0, float_precision="high",
-                               parse_dates=True)
-        df_to_sql(df=data, name=Path(file).with_suffix("").as_posix(),
-                  con=con, index_label="index", if_exists="replace")
-        print(f"Inserted {file} into {con.engine.url}.")
+    files = [Path(directory) / x for x in sorted(listdir(directory))
+             if x.endswith(".csv")]
+    parsed = parallel._map(_read_csv, files, executor=executor,
+                           max_workers=max_workers)
+    with _transaction(con) as connection:
+        for file, (data, parse_seconds) in zip(files, parsed):
+            start = time.perf_counter()
+            df_to_sql(df=data, name=file.with_suffix("").name,
+                      con=connection, index_label="index",
+                      if_exists="replace", layout=layout)
+            seconds = parse_seconds + time.perf_counter() - start
+            logger.info(f"Inserted '{file.name}': {data.size} values in "
+                        f"{seconds:.2f} seconds "
+                        f"({data.size / max(seconds, 1e-9):,.0f} values/s).")
+            print(f"Inserted {file.name} into {con.engine.url}.")
 
     return
+
+
+def _read_csv(file: Union[str, PathLike]):
+    """Parse a CSV with or without the 9-row metadata header, detected from
+    its first cell. Return the dataframe and the seconds it took."""
+    start = time.perf_counter()
+    with open(file, newline="", encoding="utf-8") as f:
+        first = next(csv.reader(f), [""])
+    if len(first) > 0 and first[0] == "Indicador":
+        header = list(range(9))
+    else:
+        header = 0
+    data = pd.read_csv(file, index_col=0, header=header,
+                       float_precision="high", parse_dates=True)
+    return data, time.perf_counter() - start
@@ -0,0 +1,309 @@
+import json
+from os import PathLike, fspath, path
+from typing import Union, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+
+FILE_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather",
+                "arrow": ".arrow"}
+METADATA_KEY = b"econuy"
+ROW_GROUP_SIZE = 1024
+
+
+class FileStore(object):
+    """Directory location that saves and loads datasets in a given file
+    format.
+
+    Can be passed anywhere a directory is accepted as ``update_loc``,
+    ``save_loc`` or :class:`~econuy.session.Session` ``location``.
+
+    Parameters
+    ----------
+    location : str or os.PathLike
+        Directory where files are saved and looked for.
+    file_format : {'csv', 'parquet', 'feather', 'arrow'}
+        ``csv`` writes the 9-row header CSVs. ``parquet`` and ``feather``
+        write compressed columnar files with the metadata levels stored in
+        the file's schema metadata. ``arrow`` writes uncompressed Arrow IPC
+        files that are memory-mapped on load, so only the requested rows and
+        columns are materialized. All but ``csv`` require ``pyarrow``.
+
+    """
+
+    def __init__(self, location: Union[str, PathLike],
+                 file_format: str = "csv"):
+        if file_format not in FILE_FORMATS.keys():
+            raise ValueError("'file_format' can be 'csv', 'parquet', "
+                             "'feather' or 'arrow'.")
+        if isinstance(location, FileStore):
+            location = location.location
+        self.location = fspath(location)
+        self.file_format = file_format
+
+    def __fspath__(self) -> str:
+        return self.location
+
+    def __repr__(self) -> str:
+        return (f"FileStore(location={self.location!r}, "
+                f"file_format={self.file_format!r})")
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, FileStore)
+                and self.location == other.location
+                and self.file_format == other.file_format)
+
+    def __hash__(self) -> int:
+        return hash((self.location, self.file_format))
+
+
+def _file_format(data_loc: Union[str, PathLike]) -> str:
+    """Return the file format used by a location."""
+    return getattr(data_loc, "file_format", "csv")
+
+
+def _suffix_format(file: Union[str, PathLike]) -> str:
+    """Return the file format corresponding to a file's suffix."""
+    suffix = path.splitext(fspath(file))[1]
+    for file_format, format_suffix in FILE_FORMATS.items():
+        if suffix == format_suffix:
+            return file_format
+    return "csv"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet, Feather and Arrow storage require "
+                          "pyarrow. Install it with "
+                          "'pip install econuy[arrow]'.")
+    return pyarrow
+
+
+def _to_python(value):
+    """Convert numpy scalars to Python objects so they can be dumped as
+    JSON."""
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def write(df: pd.DataFrame, file: Union[str, PathLike],
+          index_label: str = "index") -> None:
+    """Write a dataframe to a Parquet, Feather or Arrow IPC file.
+
+    MultiIndex columns are flattened to their first level and the full
+    metadata is stored as JSON under the ``econuy`` key of the Arrow schema
+    metadata.
+
+    """
+    pa = _import_pyarrow()
+    data = df.copy()
+    custom_meta = {}
+    if isinstance(data.columns, pd.MultiIndex):
+        custom_meta = {
+            "names": list(data.columns.names),
+            "columns": [[_to_python(x) for x in column]
+                        for column in data.columns]
+        }
+        data.columns = data.columns.get_level_values(level=0)
+    data.columns = _dedup(list(data.columns.astype(str)))
+    if data.index.name is None:
+        data.index.name = index_label
+
+    table = pa.Table.from_pandas(data, preserve_index=True)
+    schema_meta = dict(table.schema.metadata or {})
+    schema_meta[METADATA_KEY] = json.dumps(custom_meta).encode("utf-8")
+    table = table.replace_schema_metadata(schema_meta)
+
+    file_format = _suffix_format(file)
+    if file_format == "parquet":
+        pa.parquet.write_table(table, fspath(file),
+                               row_group_size=ROW_GROUP_SIZE)
+    elif file_format == "arrow":
+        pa.feather.write_feather(table, fspath(file),
+                                 compression="uncompressed")
+    else:
+        pa.feather.write_feather(table, fspath(file))
+
+    return
+
+
+def read(file: Union[str, PathLike],
+         cols: Union[str, Iterable[str], None] = None,
+         start: Optional[str] = None,
+         end: Optional[str] = None) -> pd.DataFrame:
+    """Read a file written by :func:`write`, restoring MultiIndex columns if
+    present.
+
+    Arrow IPC files are memory-mapped, and only the selected columns and
+    rows between ``start`` and ``end`` (inclusive) are materialized. Parquet
+    files only read the selected columns and skip row groups outside the
+    date range.
+
+    """
+    if not path.isfile(fspath(file)):
+        raise FileNotFoundError(fspath(file))
+    pa = _import_pyarrow()
+    file_format = _suffix_format(file)
+    if file_format == "parquet":
+        table = _read_parquet(fspath(file), cols=cols, start=start, end=end)
+    elif file_format == "arrow":
+        source = pa.memory_map(fspath(file), "r")
+        table = pa.ipc.open_file(source).read_all()
+    else:
+        table = pa.feather.read_table(fspath(file))
+
+    custom_meta = json.loads((table.schema.metadata or {})
+                             .get(METADATA_KEY, b"{}"))
+    table, positions = _select(table, cols=cols, custom_meta=custom_meta)
+    table = _slice(table, start=start, end=end)
+
+    output = table.to_pandas(split_blocks=True)
+    output.rename_axis(None, inplace=True)
+    if len(custom_meta) > 0:
+        output.columns = pd.MultiIndex.from_tuples(
+            [tuple(custom_meta["columns"][i]) for i in positions],
+            names=custom_meta["names"]
+        )
+
+    return output
+
+
+def _read_parquet(file: str, cols: Union[str, Iterable[str], None],
+                  start: Optional[str], end: Optional[str]):
+    """Read a Parquet file pushing column and date predicates down to the
+    reader."""
+    pa = _import_pyarrow()
+    schema = pa.parquet.read_schema(file)
+    index_name = _index_name(schema)
+    columns = None
+    if cols is not None:
+        custom_meta = json.loads((schema.metadata or {})
+                                 .get(METADATA_KEY, b"{}"))
+        keep, _ = _columns(schema, cols=cols, custom_meta=custom_meta)
+        columns = list(dict.fromkeys(keep))
+        if index_name is not None:
+            columns = [index_name] + columns
+
+    filters = []
+    if index_name is not None:
+        if start is not None:
+            filters.append((index_name, ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append((index_name, "<=", pd.Timestamp(end)))
+    return pa.parquet.read_table(file, columns=columns,
+                                 filters=filters or None)
+
+
+def _index_name(table) -> Optional[str]:
+    """Return the name of the column holding the pandas index."""
+    schema = getattr(table, "schema", table)
+    pandas_meta = json.loads((schema.metadata or {})
+                             .get(b"pandas", b"{}"))
+    index_columns = pandas_meta.get("index_columns", [])
+    if len(index_columns) > 0 and isinstance(index_columns[0], str):
+        return index_columns[0]
+    return None
+
+
+def _columns(table, cols: Union[str, Iterable[str], None],
+             custom_meta: dict):
+    """Return the stored names of the requested data columns, in the
+    requested order, and their metadata positions."""
+    schema = getattr(table, "schema", table)
+    index_name = _index_name(schema)
+    if len(custom_meta) > 0:
+        indicators = [column[0] for column in custom_meta["columns"]]
+        names = _dedup([str(indicator) for indicator in indicators])
+    else:
+        names = [name for name in schema.names if name != index_name]
+        indicators = names
+    if cols is None or (isinstance(cols, str) and cols == "*"):
+        return names, list(range(len(names)))
+    if isinstance(cols, str):
+        cols = [cols]
+    positions = [i for col in cols
+                 for i, indicator in enumerate(indicators)
+                 if indicator == col]
+    return [names[i] for i in positions], positions
+
+
+def _select(table, cols: Union[str, Iterable[str], None],
+            custom_meta: dict):
+    """Keep only the requested data columns, in the requested order, and
+    return the metadata positions of the kept columns."""
+    if cols is None or (isinstance(cols, str) and cols == "*"):
+        _, positions = _columns(table, cols=None, custom_meta=custom_meta)
+        return table, positions
+    keep, positions = _columns(table, cols=cols, custom_meta=custom_meta)
+    index_name = _index_name(table)
+    if index_name is not None:
+        keep = [index_name] + keep
+    return table.select(keep), positions
+
+
+def _slice(table, start: Optional[str], end: Optional[str]):
+    """Keep the rows whose index falls between ``start`` and ``end``.
+
+    Uses zero-copy slicing when the index is sorted.
+
+    """
+    index_name = _index_name(table)
+    if (start is None and end is None) or index_name is None:
+        return table
+    index = pd.DatetimeIndex(table.column(index_name).to_numpy())
+    if index.is_monotonic_increasing:
+        first = 0 if start is None else index.searchsorted(
+            pd.Timestamp(start), side="left")
+        last = len(index) if end is None else index.searchsorted(
+            pd.Timestamp(end), side="right")
+        return table.slice(first, max(last - first, 0))
+    mask = np.ones(len(index), dtype=bool)
+    if start is not None:
+        mask &= index >= pd.Timestamp(start)
+    if end is not None:
+        mask &= index <= pd.Timestamp(end)
+    return table.filter(mask)
+
+
+def _dedup(names: list) -> list:
+    """Mangle duplicate column names the way ``pd.read_csv`` does."""
+    seen = {}
+    output = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            output.append(f"{name}.{seen[name]}")
+        else:
+            seen[name] = 0
+            output.append(name)
+    return output
+
+
+def _common_rows(stored: pd.DataFrame, data: pd.DataFrame) -> int:
+    """Return how many leading rows of ``data`` are already stored unchanged.
+
+    Values are compared with a tight relative tolerance so that text
+    round-trips do not count as revisions. Returns 0 if the frames cannot be
+    compared.
+
+    """
+    n = min(len(stored), len(data))
+    if n == 0 or stored.shape[1] != data.shape[1]:
+        return 0
+    try:
+        stored_values = stored.values[:n].astype(float)
+        new_values = data.values[:n].astype(float)
+    except (TypeError, ValueError):
+        return 0
+    same = (stored.index[:n] == data.index[:n])
+    same &= np.isclose(stored_values, new_values, rtol=1e-12, atol=0,
+                       equal_nan=True).all(axis=1)
+    if same.all():
+        return n
+    return int(np.argmin(same))
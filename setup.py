@@ -49,7 +49,8 @@ setup(
     keywords=["uruguay", "economy", "economic", "statistics", "data"],
     install_requires=pipfile_lock_requirements,
     extras_require={
-        "pgsql":  ["psycopg2==2.8.5"]},
+        "pgsql":  ["psycopg2==2.8.5"],
+        "arrow": ["pyarrow>=0.17.0"]},
     packages=packages,
     python_requires=">=3.6"
 )
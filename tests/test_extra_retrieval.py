@@ -1,13 +1,19 @@
 import datetime as dt
+import json
+from io import BytesIO
 from os import path
 
 import numpy as np
 import pandas as pd
+import pytest
+import requests
+from opnieuw.test_util import retry_immediately
 from sqlalchemy import create_engine
 
-from econuy.retrieval import national_accounts
+from econuy.retrieval import (commodity_index, national_accounts, nxr,
+                              reserves, rxr, trade)
 from econuy.session import Session
-from econuy.utils import metadata, sqlutil
+from econuy.utils import metadata, ops, sqlutil
 try:
     from tests.test_session import remove_clutter
 except ImportError:
@@ -37,6 +43,19 @@ def test_changes():
     remove_clutter()
 
 
+def test_changes_months():
+    start = reserves._first_revisable(pd.Timestamp("2020-06-17"))
+    assert start == dt.datetime(2020, 5, 1)
+    months = reserves._months(start=start, end=dt.datetime(2020, 6, 17))
+    assert [link[-11:] for link, _ in months] == ["may2020.xls",
+                                                  "jun2020.xls"]
+    assert [first for _, first in months] == [pd.Timestamp("2020-05-01"),
+                                              pd.Timestamp("2020-06-01")]
+    months = reserves._months(start=dt.datetime(2014, 4, 1),
+                              end=dt.datetime(2014, 5, 31))
+    assert months[-1][0].endswith("mayo2014.xls")
+
+
 def test_rxr_official():
     remove_clutter()
     session = Session(location=TEST_DIR)
@@ -66,6 +85,48 @@ def test_rxr_custom():
     remove_clutter()
 
 
+def _response(status_code, content=b""):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.url = "http://test"
+    return response
+
+
+class _FakeSession(object):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_rxr_custom_sources():
+    black = json.dumps([["Fecha", "Compra", "Venta"],
+                        ["02-01-2020", "70,0", "74,0"],
+                        ["03-02-2020", "76,0", "80,0"]]).encode("utf-8")
+    imf = json.dumps({"CompactData": {"DataSet": {"Series": {"Obs": [
+        {"@TIME_PERIOD": "2020-01", "@OBS_VALUE": "1.5"},
+        {"@TIME_PERIOD": "2020-02", "@OBS_VALUE": "2.5"}]}}}})
+    with retry_immediately():
+        session = _FakeSession([_response(503), _response(200, black)])
+        black_xr = rxr._ar_black_xr(session)
+        assert session.calls == 2
+        assert black_xr.iloc[:, 0].tolist() == [72.0, 78.0]
+        session = _FakeSession([_response(503),
+                                _response(200, imf.encode("utf-8"))])
+        series = rxr._imf_series("US", "PCPI_IX", session)
+        assert session.calls == 2
+        assert series.index[-1] == pd.Timestamp("2020-02-29")
+        assert series.columns.tolist() == ["US.PCPI_IX"]
+        session = _FakeSession([_response(503)] * 4)
+        with pytest.raises(requests.exceptions.HTTPError):
+            rxr._ar_cpi(session)
+        assert session.calls == 4
+
+
 def test_comm_index():
     remove_clutter()
     session = Session(location=TEST_DIR)
@@ -79,6 +140,45 @@ def test_comm_index():
     remove_clutter()
 
 
+def test_comm_weights_incremental(tmp_path, monkeypatch):
+    commodities = ["A Barley", "B Wood", "C Gold", "D Milk", "E Pulp",
+                   "F Rice", "G Soybeans", "H Wheat", "I Wool",
+                   "BOVINE MEAT", "Bovine animals, live",
+                   "Edible offal of bovine animals, fresh or chilled",
+                   "Edible offal of bovine animals, frozen",
+                   "Meat and offal (other than liver), of bovine animals, "
+                   "prepared or preserv"]
+    years = []
+
+    def fake_year(year, session, limiter):
+        years.append(year)
+        return pd.DataFrame({"period": year, "cmdDescE": commodities,
+                             "TradeValue": np.arange(1, 15)})
+
+    monkeypatch.setattr(commodity_index, "_weights_year", fake_year)
+    last_year = dt.datetime.now().year - 2
+    columns = ["Barley", "Wood", "Gold", "Milk", "Pulp",
+               "Rice", "Soybeans", "Wheat", "Wool", "Beef"]
+    stored = pd.DataFrame(0.1, columns=columns,
+                          index=pd.date_range(end=f"{last_year - 3}-12-31",
+                                              periods=24, freq="M"))
+    ops._io(operation="save", data_loc=tmp_path, data=stored,
+            name="commodity_weights")
+    weights = commodity_index._weights(update_loc=tmp_path, only_get=False,
+                                       incremental=True)
+    assert sorted(years) == list(range(last_year - 4, last_year + 1))
+    assert weights.index[len(stored)] == pd.Timestamp(f"{last_year - 2}-01-31")
+    assert weights.index[-1] == pd.Timestamp(f"{last_year}-12-31")
+    assert weights.iloc[len(stored):].notna().all().all()
+    ops._io(operation="save", data_loc=tmp_path, data=weights,
+            name="commodity_weights")
+    years.clear()
+    compare = commodity_index._weights(update_loc=tmp_path, only_get=False,
+                                       incremental=True)
+    assert years == []
+    assert len(compare) == len(weights)
+
+
 def test_lin():
     remove_clutter()
     lin = national_accounts._lin_gdp(update_loc=TEST_DIR, save_loc=TEST_DIR)
@@ -106,6 +206,19 @@ def test_nxr_daily():
     remove_clutter()
 
 
+def test_nxr_daily_windows():
+    start = dt.datetime(2020, 1, 31)
+    windows = nxr._windows(start=start, end=dt.datetime(2020, 4, 15))
+    assert windows[0] == (dt.datetime(2020, 2, 1), dt.datetime(2020, 3, 1))
+    assert windows[-1] == (dt.datetime(2020, 4, 1), dt.datetime(2020, 4, 15))
+    for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start == previous_end + dt.timedelta(days=1)
+    assert all((to_ - from_).days < 30 for from_, to_ in windows)
+    assert nxr._windows(start=start, end=dt.datetime(2020, 3, 1)) \
+        == [(dt.datetime(2020, 2, 1), dt.datetime(2020, 3, 1))]
+    assert nxr._windows(start=start, end=start) == []
+
+
 def test_nxr_monthly():
     remove_clutter()
     session = Session(location=TEST_DIR)
@@ -113,3 +226,39 @@ def test_nxr_monthly():
     assert len(nxr.columns) == 2
     assert isinstance(nxr.index[0], pd._libs.tslibs.timestamps.Timestamp)
     remove_clutter()
+
+
+def _trade_workbook(n_sheets=8, n_rows=40, n_periods=120):
+    dates = pd.date_range(start="2000-01-01", periods=n_periods, freq="MS")
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for i in range(n_sheets):
+            sheet = pd.DataFrame(np.random.rand(n_rows, n_periods),
+                                 index=[f"row{j}" for j in range(n_rows)],
+                                 columns=dates + pd.DateOffset(years=10 * i))
+            sheet.to_excel(writer, sheet_name=f"s{i}", startrow=7)
+    return buffer.getvalue()
+
+
+def test_trade_parse_parallel():
+    pytest.importorskip("openpyxl")
+    meta = {"cols": "A:ZZ", "old_colnames": ["row0", "row1", "row2"],
+            "new_colnames": ["A", "B", "C"]}
+    contents = {f"file{i}": _trade_workbook() for i in range(3)}
+    meta = {file: meta for file in contents.keys()}
+    results = {}
+    for executor in [None, "thread", "process"]:
+        results[executor] = trade._parse_workbooks(contents,
+                                                   executor=executor,
+                                                   meta=meta)
+    for executor in ["thread", "process"]:
+        assert list(results[executor].keys()) == list(contents.keys())
+        for file, sheets in results[None].items():
+            assert len(sheets) == 8
+            assert len(results[executor][file]) == 8
+            for serial, parallel in zip(sheets, results[executor][file]):
+                assert serial.equals(parallel)
+    assert list(results[None]["file0"][1].columns) == ["A", "B", "C"]
+    assert results[None]["file0"][1].index[0] == pd.Timestamp("2010-01-31")
+    with pytest.raises(ValueError):
+        trade.get(executor="wrong")
@@ -1,16 +1,18 @@
 import shutil
+import time
 from os import listdir, remove, path
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
 import pytest
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, event, inspect
 
 from econuy import transform
-from econuy.retrieval import nxr
+from econuy.retrieval import cpi, nxr, reserves, rxr
 from econuy import Session
-from econuy.utils import metadata, sqlutil
+from econuy.utils import cache, metadata, ops, parallel, sqlutil
 from econuy.utils.lstrings import fiscal_metadata
 try:
     from tests.test_transform import dummy_df
@@ -312,6 +314,168 @@ def test_save():
     assert path.isfile(Path(session.location) / "test_save.csv")
     remove_clutter()
     shutil.rmtree(session.location)
+    pytest.importorskip("pyarrow")
+    session = Session(location=TEST_DIR, dataset=data, file_format="parquet")
+    session.save(name="test_save")
+    assert path.isfile(Path(TEST_DIR) / "test_save.parquet")
+    compare = session.resample(target="Q-DEC").location
+    assert compare.file_format == "parquet"
+    with pytest.raises(ValueError):
+        Session(location=TEST_CON, file_format="wrong")
+    remove_clutter()
+
+
+def test_pooled_engine(tmp_path):
+    url = f"sqlite:///{(tmp_path / 'econuy.db').as_posix()}"
+    session = Session(location=url, pool_size=3, log=0)
+    engine = session.location
+    assert engine.pool.size() == 3
+    checkouts = []
+    event.listen(engine, "checkout", lambda *args: checkouts.append(1))
+    data = pd.read_csv(path.join(TEST_DIR, "reserves_chg.csv"), index_col=0,
+                       header=list(range(9)), parse_dates=True)
+    metadata._set(data)
+    session.dataset = {"a": data, "b": data}
+    session.save(name="reserves")
+    assert len(checkouts) == 1
+    assert {"reserves_a", "reserves_b"} <= set(
+        inspect(engine).get_table_names())
+    session.dataset = data
+    session.save(name="reserves_chg")
+    session.only_get = True
+    checkouts.clear()
+    compare = session.get(dataset="reserves_chg").dataset
+    assert len(checkouts) == 1
+    assert compare.index.equals(data.index)
+    session.dataset = {"c": data, "d": "not a dataframe"}
+    with pytest.raises(Exception):
+        session.save(name="reserves")
+    assert "reserves_c" not in inspect(engine).get_table_names()
+
+
+def test_engine_threads(tmp_path):
+    data = dummy_df(freq="M")
+
+    def write(i):
+        try:
+            with sqlutil._transaction(engine) as con:
+                sqlutil.df_to_sql(data, name=f"thread_{i}", con=con)
+                time.sleep(0.05)
+                if i == 0:
+                    raise ValueError
+        except ValueError:
+            pass
+
+    for url in ["sqlite://",
+                f"sqlite:///{(tmp_path / 'threads.db').as_posix()}"]:
+        engine = sqlutil._engine(url)
+        parallel._map(write, range(4), executor="thread", max_workers=4)
+        parallel._map(write, range(4, 8), executor="thread", max_workers=4)
+        tables = set(inspect(engine).get_table_names())
+        assert "thread_0" not in tables
+        assert {f"thread_{i}" for i in range(1, 8)} <= tables
+        with sqlutil._transaction(engine) as con:
+            compare = sqlutil.read(con=con, table_name="thread_7")
+        assert np.allclose(compare.values, data.values)
+
+
+def test_dataset_cache(tmp_path, monkeypatch):
+    data = pd.read_csv(path.join(TEST_DIR, "reserves_chg.csv"), index_col=0,
+                       header=list(range(9)), parse_dates=True)
+    metadata._set(data)
+    session = Session(location=tmp_path, dataset=data, only_get=True, log=0)
+    session.save(name="reserves_chg")
+    loads = []
+    load = ops._load
+    monkeypatch.setattr(ops, "_load",
+                        lambda *args, **kwargs: loads.append(kwargs)
+                        or load(*args, **kwargs))
+    first = session.get(dataset="reserves_chg").dataset
+    first.iloc[:, 0] = 0
+    derived = session.resample(target="M", operation="sum")
+    assert derived.cache is session.cache
+    compare = derived.get(dataset="reserves_chg").dataset
+    assert len(loads) == 1
+    assert not (compare.iloc[:, 0] == 0).all()
+    session.dataset = compare.iloc[:-10]
+    session.save(name="reserves_chg")
+    compare = session.get(dataset="reserves_chg").dataset
+    assert len(loads) == 2
+    assert len(compare) == len(data) - 10
+    session = Session(location=tmp_path, only_get=True, log=0, cache=False)
+    session.get(dataset="reserves_chg")
+    session.get(dataset="reserves_chg")
+    assert len(loads) == 4
+    datasets = cache.DatasetCache()
+    with datasets.activate():
+        window = ops.load(tmp_path, name="reserves_chg", start="2015-01-01",
+                          end="2015-12-31")
+        assert (loads[-1]["start"], loads[-1]["end"]) == ("2015-01-01",
+                                                          "2015-12-31")
+        assert len(datasets) == 0
+        ops.load(tmp_path, name="reserves_chg")
+        assert len(datasets) == 1
+        compare = ops.load(tmp_path, name="reserves_chg", start="2015-01-01",
+                           end="2015-12-31")
+    assert len(loads) == 6
+    assert compare.equals(window)
+
+
+def test_get_many(monkeypatch):
+    events = []
+
+    def fake(name):
+        def get(**kwargs):
+            events.append(("start", name, time.monotonic()))
+            time.sleep(0.2)
+            events.append(("end", name, time.monotonic()))
+            return dummy_df(freq="M")
+        return get
+
+    monkeypatch.setattr(cpi, "get", fake("cpi"))
+    monkeypatch.setattr(nxr, "get_monthly", fake("nxr_monthly"))
+    monkeypatch.setattr(rxr, "get_custom", fake("rxr_custom"))
+    monkeypatch.setattr(reserves, "get_changes", fake("reserves_changes"))
+    session = Session(location=TEST_DIR, log=0)
+    start = time.monotonic()
+    session.get_many(["rxr_custom", "reserves_chg"], max_workers=4)
+    assert time.monotonic() - start < 0.6
+    assert list(session.dataset.keys()) == ["cpi", "nxr_monthly",
+                                            "reserves_changes",
+                                            "rxr_custom"]
+    assert set(session.timings.keys()) == set(session.dataset.keys())
+    assert all(seconds >= 0.2 for seconds in session.timings.values())
+    times = {(event, name): moment for event, name, moment in events}
+    assert times[("start", "rxr_custom")] >= max(times[("end", "cpi")],
+                                                 times[("end", "nxr_monthly")])
+    assert times[("start", "reserves_changes")] < times[("end", "cpi")]
+    with pytest.raises(ValueError):
+        session.get_many(["wrong"])
+    remove_clutter()
+
+
+def test_get_many_sql(tmp_path, monkeypatch):
+    def fake(name):
+        def get(update_loc=None, save_loc=None, **kwargs):
+            previous = ops._io(operation="update", data_loc=update_loc,
+                               name=name)
+            data = dummy_df(freq="M", periods=len(previous) + 1)
+            ops._io(operation="save", data_loc=save_loc, name=name,
+                    data=data)
+            return data
+        return get
+
+    monkeypatch.setattr(cpi, "get", fake("cpi"))
+    monkeypatch.setattr(nxr, "get_monthly", fake("nxr_monthly"))
+    monkeypatch.setattr(rxr, "get_custom", fake("rxr_custom"))
+    monkeypatch.setattr(reserves, "get_changes", fake("reserves_changes"))
+    url = f"sqlite:///{(tmp_path / 'many.db').as_posix()}"
+    session = Session(location=url, log=0)
+    for i in range(1, 4):
+        session.get_many(["rxr_custom", "reserves_chg"], max_workers=4)
+        assert all(len(data) == i for data in session.dataset.values())
+    assert {"cpi", "nxr_monthly", "rxr_custom", "reserves_changes"} \
+        <= set(inspect(session.location).get_table_names())
 
 
 def test_logging(caplog):
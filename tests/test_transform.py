@@ -1,13 +1,14 @@
 from os import path
+from types import SimpleNamespace
 
 import numpy as np
 import pandas as pd
 import pytest
 from sqlalchemy import create_engine
 
-from econuy import transform
+from econuy import session as session_module, transform
 from econuy.session import Session
-from econuy.utils import metadata
+from econuy.utils import cache, metadata, ops
 
 CUR_DIR = path.abspath(path.dirname(__file__))
 TEST_DIR = path.join(path.dirname(CUR_DIR), "test-data")
@@ -252,6 +253,172 @@ def test_decompose():
                                   fallback="wrong").dataset
 
 
+def test_decompose_parallel():
+    data = dummy_df(freq="M", periods=120, ts_type="Flujo")
+    data = data.abs()
+    trend, seas = transform.decompose(data, method="loess")
+    for executor in ["thread", "process"]:
+        trend_par, seas_par = transform.decompose(data, method="loess",
+                                                  executor=executor,
+                                                  max_workers=2)
+        assert trend_par.equals(trend)
+        assert seas_par.equals(seas)
+    with pytest.raises(ValueError):
+        transform.decompose(data, method="loess", executor="wrong")
+
+
+def test_decompose_ladder(monkeypatch):
+    data = dummy_df(freq="M", periods=120, ts_type="Flujo").abs()
+    calls = []
+
+    def fake_x13a(series, outlier, trading, **kwargs):
+        calls.append((series.name, outlier, trading))
+        if series.name == "B":
+            raise transform.X13Error
+        result = transform.STL(series).fit()
+        return SimpleNamespace(trend=result.trend,
+                               seasadj=result.observed - result.seasonal)
+
+    monkeypatch.setattr(transform, "x13a", fake_x13a)
+    with pytest.warns(UserWarning):
+        trend = transform.decompose(data, flavor="trend", force_x13=True,
+                                    x13_binary=None)
+    assert calls == [("A", True, True), ("B", True, True),
+                     ("B", False, True), ("B", False, False),
+                     ("C", True, True)]
+    assert trend.iloc[:, 1].isna().all()
+    assert trend.iloc[:, [0, 2]].notna().any().all()
+    calls.clear()
+    trend = transform.decompose(data, flavor="trend", force_x13=False,
+                                fallback="loess", x13_binary=None)
+    assert calls == [("A", True, True), ("B", True, True),
+                     ("C", True, True)]
+    loess = transform.decompose(data[["B"]], flavor="trend", method="loess")
+    assert trend.iloc[:, [1]].equals(loess)
+
+
+def test_decompose_cache(tmp_path):
+    data = dummy_df(freq="M", periods=120, ts_type="Flujo").abs()
+    cache.clear()
+    trend, seas = transform.decompose(data, method="loess",
+                                      cache_loc=tmp_path)
+    assert cache.info() == {"hits": 0, "misses": 3}
+    trend_cached, seas_cached = transform.decompose(data, method="loess",
+                                                    cache_loc=tmp_path)
+    assert cache.info() == {"hits": 3, "misses": 3}
+    assert trend_cached.equals(trend)
+    assert seas_cached.equals(seas)
+    revised = data.copy()
+    revised.iloc[-1, 0] = revised.iloc[-1, 0] + 1
+    transform.decompose(revised, method="loess", cache_loc=tmp_path)
+    assert cache.info() == {"hits": 5, "misses": 4}
+    transform.decompose(data, method="ma", cache_loc=tmp_path)
+    assert cache.info() == {"hits": 5, "misses": 7}
+    cache.put(tmp_path, "extra", "value", max_size=0)
+    assert len(list(tmp_path.glob("*.pkl"))) == 0
+    cache.clear(tmp_path)
+
+
+def test_decompose_cache_fallback(tmp_path, monkeypatch):
+    data = dummy_df(freq="M", periods=120, ts_type="Flujo").abs()
+    binary = tmp_path / "x13as"
+    binary.touch()
+    cache_loc = tmp_path / "cache"
+
+    class FakeX13Error(Exception):
+        pass
+
+    def failing(series, **kwargs):
+        raise FakeX13Error
+
+    def working(series, **kwargs):
+        return SimpleNamespace(trend=series, seasadj=series)
+
+    transform._import_statsmodels()
+    monkeypatch.setattr(transform, "X13Error", FakeX13Error)
+    monkeypatch.setattr(transform, "x13a", failing)
+    cache.clear()
+    fallback = transform.decompose(data, flavor="trend", x13_binary=binary,
+                                   cache_loc=cache_loc)
+    assert not np.allclose(fallback, data)
+    assert len(list(cache_loc.glob("*.pkl"))) == 0
+    monkeypatch.setattr(transform, "x13a", working)
+    trend = transform.decompose(data, flavor="trend", x13_binary=binary,
+                                cache_loc=cache_loc)
+    assert np.allclose(trend, data)
+    assert len(list(cache_loc.glob("*.pkl"))) == 3
+    transform.decompose(data, flavor="trend", x13_binary=binary,
+                        cache_loc=cache_loc)
+    assert cache.info() == {"hits": 3, "misses": 6}
+    other = tmp_path / "other" / "x13as"
+    other.parent.mkdir()
+    other.touch()
+    transform.decompose(data, flavor="trend", x13_binary=other,
+                        cache_loc=cache_loc)
+    assert cache.info() == {"hits": 3, "misses": 9}
+    cache.clear(cache_loc)
+
+
+def test_search_binary(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    binary = project / "resources" / "x13as"
+    binary.parent.mkdir(parents=True)
+    binary.touch()
+    monkeypatch.chdir(project)
+    monkeypatch.delenv("ECONUY_X13_BINARY", raising=False)
+    found = transform._search_binary("x13as", search_parents=1)
+    assert found == binary.absolute().as_posix()
+    assert transform._rsearch(tmp_path, "x13as", n=0, max_depth=1) is True
+    calls = []
+    monkeypatch.setattr(transform, "_rsearch",
+                        lambda **kwargs: calls.append(kwargs) or True)
+    assert transform._search_binary("x13as", search_parents=1) == found
+    assert calls == []
+    binary.unlink()
+    assert transform._search_binary("x13as", search_parents=1) is True
+    assert len(calls) == 1
+    assert transform._search_binary("x13as", search_parents=1) is True
+    assert len(calls) == 1
+    monkeypatch.setenv("ECONUY_X13_BINARY", "custom/x13as")
+    assert transform._search_binary("x13as") == "custom/x13as"
+
+
+def test_convert_pushdown(tmp_path, monkeypatch):
+    nxr_data = dummy_df(freq="M", periods=400, ts_type="Stock")
+    nxr_data = nxr_data.abs().iloc[:, :2]
+    ops._io(operation="save", data_loc=tmp_path, name="nxr_monthly",
+            data=nxr_data)
+    calls = []
+    load = ops.load
+
+    def recorder(*args, **kwargs):
+        calls.append((kwargs["start"], kwargs["end"]))
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(ops, "load", recorder)
+    data = dummy_df(freq="M", periods=200,
+                    ts_type="Stock").loc["2010":"2011"]
+    usd = transform.convert_usd(data, update_loc=tmp_path, only_get=True)
+    assert calls == [("2009-01-01", "2012-12-31")]
+    expected = data.div(nxr_data.iloc[:, 1].loc[data.index], axis=0)
+    assert np.allclose(usd.values, expected.values)
+
+
+def test_convert_real_base(tmp_path):
+    cpi_data = dummy_df(freq="M", periods=400, ts_type="Stock")
+    cpi_data = cpi_data.abs().iloc[:, [1]].cumsum()
+    ops._io(operation="save", data_loc=tmp_path, name="cpi", data=cpi_data)
+    data = dummy_df(freq="M", periods=200, ts_type="Stock")
+    data = data.loc["2010":"2015"]
+    data.iloc[:, :] = 100
+    real = transform.convert_real(data, start_date="2012-06-30",
+                                  update_loc=tmp_path, only_get=True)
+    assert np.allclose(real.loc["2012-06-30"], 100)
+    cpi_base = cpi_data.iloc[:, 0].loc["2012-06-30"]
+    expected = 100 / cpi_data.iloc[:, 0].loc[data.index] * cpi_base
+    assert np.allclose(real.iloc[:, 0], expected)
+
+
 def test_base_index():
     data = dummy_df(freq="M")
     session = Session(location=TEST_CON, dataset=data)
@@ -354,3 +521,100 @@ def test_convert():
     data_q = dummy_df(freq="Q-DEC", ts_type="Flujo")
     session = Session(location=TEST_CON, dataset=data_q)
     pcgdp = session.convert(flavor="pcgdp")
+
+
+def test_lazy():
+    data = dummy_df(freq="M", ts_type="Flujo")
+    data_dict = {"a": data, "b": dummy_df(freq="Q-DEC", ts_type="Flujo")}
+    for dataset in [data, data_dict]:
+        eager = (Session(location=TEST_CON, dataset=dataset)
+                 .rolling(periods=3, operation="average")
+                 .chg_diff(operation="chg", period_op="inter")
+                 .resample(target="A-DEC", operation="average")
+                 .select(["C", "A"]).final())
+        session = Session(location=TEST_CON, dataset=dataset, lazy=True)
+        lazy = (session.rolling(periods=3, operation="average")
+                .chg_diff(operation="chg", period_op="inter")
+                .resample(target="A-DEC", operation="average")
+                .select(["C", "A"]))
+        assert lazy.dataset is dataset
+        assert session._plan == []
+        steps = session_module._optimize(lazy._plan, uniform=True)
+        assert [step[0] for step in steps] \
+            == ["select", "_rolling_chg_diff", "resample"]
+        if isinstance(dataset, dict):
+            for key in dataset.keys():
+                assert np.allclose(lazy.final()[key], eager[key],
+                                   equal_nan=True)
+                assert lazy.final()[key].columns.equals(eager[key].columns)
+        else:
+            compare = lazy.final()
+            assert np.allclose(compare, eager, equal_nan=True)
+            assert compare.columns.equals(eager.columns)
+    plan = [("rolling", {}), ("chg_diff", {"period_op": "annual"})]
+    assert session_module._optimize(plan) == plan
+    for operation in ["chg", "diff"]:
+        for period_op in ["last", "inter"]:
+            expected = transform.chg_diff(transform.rolling(data),
+                                          operation=operation,
+                                          period_op=period_op)
+            compare = transform._rolling_chg_diff(data, operation=operation,
+                                                  period_op=period_op)
+            assert np.allclose(compare, expected, equal_nan=True)
+            assert compare.columns.equals(expected.columns)
+
+
+def test_lazy_mixed():
+    stock = dummy_df(freq="M", ts_type="Stock")
+    flow = dummy_df(freq="M", ts_type="Flujo")
+    data = pd.concat([stock.iloc[:, [0]], flow.iloc[:, [1]]], axis=1)
+    assert not session_module._uniform(data)
+    eager = (Session(location=TEST_CON, dataset=data)
+             .chg_diff(operation="chg", period_op="annual")
+             .select(["B"]).final())
+    lazy = (Session(location=TEST_CON, dataset=data, lazy=True)
+            .chg_diff(operation="chg", period_op="annual")
+            .select(["B"]))
+    assert [step[0] for step in session_module._optimize(lazy._plan)] \
+        == ["chg_diff", "select"]
+    compare = lazy.final()
+    assert compare.notna().any().all()
+    assert np.allclose(compare, eager, equal_nan=True)
+    assert compare.columns.equals(eager.columns)
+    quarterly = dummy_df(freq="Q-DEC", ts_type="Flujo")
+    quarterly.columns = quarterly.columns.set_levels(["Q-DEC"],
+                                                     level="Frecuencia")
+    mixed = pd.concat([quarterly.iloc[:, [0]], flow.iloc[:, [1]]], axis=1)
+    assert not session_module._uniform(mixed)
+    assert session_module._uniform({"a": stock, "b": flow})
+    plan = [("base_index", {}), ("chg_diff", {}), ("select", {})]
+    assert session_module._optimize(plan) == plan
+    plan = [("chg_diff", {}), ("base_index", {}), ("select", {})]
+    assert session_module._optimize(plan) \
+        == [("chg_diff", {}), ("select", {}), ("base_index", {})]
+
+
+def test_executor(caplog):
+    data_dict = {"b": dummy_df(freq="M", ts_type="Flujo"),
+                 "a": dummy_df(freq="Q-DEC", ts_type="Flujo"),
+                 "c": dummy_df(freq="M", ts_type="Stock")}
+    serial = (Session(location=TEST_CON, dataset=data_dict)
+              .rolling(periods=3, operation="sum")
+              .resample(target="A-DEC", operation="average")
+              .final())
+    for executor in ["thread", "process"]:
+        session = Session(location=TEST_CON, dataset=data_dict,
+                          executor=executor, max_workers=2)
+        compare = (session.rolling(periods=3, operation="sum")
+                   .resample(target="A-DEC", operation="average"))
+        assert compare.executor == executor
+        assert list(compare.dataset.keys()) == ["b", "a", "c"]
+        for key in data_dict.keys():
+            assert compare.dataset[key].equals(serial[key])
+    broken = dict(data_dict, a=data_dict["a"].iloc[:, 0])
+    session = Session(location=TEST_CON, dataset=broken, executor="thread")
+    with pytest.raises(AttributeError):
+        session.resample(target="A-DEC", operation="average")
+    assert "'a'" in caplog.text
+    with pytest.raises(ValueError):
+        Session(location=TEST_CON, executor="cluster")
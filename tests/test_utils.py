@@ -1,11 +1,17 @@
+import subprocess
+import sys
+import time
 from os import path
 
+import numpy as np
+import pandas as pd
 import pytest
 from sqlalchemy import create_engine
 
+from econuy.utils import (cache, metadata, ops, parallel, registry,
+                          sqlutil, store)
 from econuy.utils.metadata import _get_sources
 from econuy.retrieval import cpi
-from econuy.utils import sqlutil
 try:
     from tests.test_session import remove_clutter
 except ImportError:
@@ -45,7 +51,351 @@ def test_sqlutil():
                  cols=["1. Compras netas de moneda extranjera"])
 
 
+@pytest.mark.parametrize("file_format", ["parquet", "feather", "arrow"])
+def test_store(tmp_path, file_format):
+    pytest.importorskip("pyarrow")
+    loc = store.FileStore(tmp_path, file_format=file_format)
+    for name in ["reserves_chg", "nxr_daily"]:
+        data = ops._io(operation="update", data_loc=TEST_DIR, name=name)
+        ops._io(operation="save", data_loc=loc, name=name, data=data)
+        assert path.isfile(tmp_path / f"{name}.{file_format}")
+        compare = ops._io(operation="update", data_loc=loc, name=name)
+        assert compare.equals(data)
+        assert compare.columns.equals(data.columns)
+        assert list(compare.columns.names) == list(data.columns.names)
+    weights = ops._io(operation="update", data_loc=TEST_DIR,
+                      name="commodity_weights", multiindex=False)
+    ops._io(operation="save", data_loc=loc, name="commodity_weights",
+            data=weights)
+    compare = ops._io(operation="update", data_loc=loc,
+                      name="commodity_weights", multiindex=False)
+    assert compare.equals(weights)
+    assert ops._io(operation="update", data_loc=loc,
+                   name="missing").equals(pd.DataFrame())
+    with pytest.raises(ValueError):
+        store.FileStore(tmp_path, file_format="wrong")
+
+
+def test_store_slice(tmp_path):
+    pytest.importorskip("pyarrow")
+    loc = store.FileStore(tmp_path, file_format="arrow")
+    data = ops._io(operation="update", data_loc=TEST_DIR, name="reserves_chg")
+    ops._io(operation="save", data_loc=loc, name="reserves_chg", data=data)
+    file = tmp_path / "reserves_chg.arrow"
+    cols = list(data.columns.get_level_values(0)[[5, 2]])
+    compare = ops._load(file, cols=cols, start="2015-03-01",
+                        end="2015-06-30")
+    expected = data.loc["2015-03-01":"2015-06-30"].iloc[:, [5, 2]]
+    assert compare.equals(expected)
+    assert compare.columns.equals(expected.columns)
+    compare = ops._load(file, start="2019-12-15")
+    assert compare.equals(data.loc["2019-12-15":])
+    compare = ops._load(file, end="2010-01-01")
+    assert len(compare) == 0
+
+
+def test_load(tmp_path):
+    data = ops._io(operation="update", data_loc=TEST_DIR, name="reserves_chg")
+    cols = list(data.columns.get_level_values(0)[[5, 2]])
+    expected = data.loc["2015-03-01":"2015-06-30"].iloc[:, [5, 2]]
+    locations = [TEST_DIR, TEST_CON]
+    try:
+        import pyarrow  # noqa: F401
+        for file_format in ["parquet", "feather", "arrow"]:
+            loc = store.FileStore(tmp_path, file_format=file_format)
+            ops._io(operation="save", data_loc=loc, name="reserves_chg",
+                    data=data)
+            locations.append(loc)
+    except ImportError:
+        pass
+    for loc in locations:
+        compare = ops.load(loc, name="reserves_chg", cols=cols,
+                           start="2015-03-01", end="2015-06-30")
+        assert np.allclose(compare.values, expected.values, equal_nan=True)
+        assert compare.index.equals(expected.index)
+        assert (list(compare.columns.get_level_values(0))
+                == list(expected.columns.get_level_values(0)))
+        compare = ops.load(loc, name="reserves_chg", start="2020-01-01")
+        assert len(compare) == len(data.loc["2020-01-01":])
+    assert ops.load(TEST_DIR, name="missing").equals(pd.DataFrame())
+
+
+def test_upsert(tmp_path, monkeypatch):
+    try:
+        from tests.test_transform import dummy_df
+    except ImportError:
+        from .test_transform import dummy_df
+    con = create_engine("sqlite://").connect()
+    data = dummy_df(freq="D", periods=400)
+    for loc in [tmp_path, con]:
+        ops._io(operation="save", data_loc=loc, name="upsert",
+                data=data.iloc[:300])
+        file = tmp_path / "upsert.csv"
+        before = file.read_bytes()
+        revised = data.copy()
+        revised.iloc[290:295] = revised.iloc[290:295] * 2
+        ops._io(operation="save", data_loc=loc, name="upsert", data=revised)
+        compare = ops._io(operation="update", data_loc=loc, name="upsert")
+        assert np.allclose(compare.values, revised.values)
+        assert compare.index.equals(revised.index)
+        if loc == tmp_path:
+            header = data.iloc[:0].to_csv()
+            unchanged = before[:len(header)
+                               + len(data.iloc[:290].to_csv(header=False))]
+            assert file.read_bytes().startswith(unchanged)
+        ops._io(operation="save", data_loc=loc, name="upsert",
+                data=revised.iloc[:350])
+        compare = ops._io(operation="update", data_loc=loc, name="upsert")
+        assert len(compare) == 350
+        partial = revised.iloc[340:360].copy()
+        partial.iloc[-1] = partial.iloc[-1] * 3
+        ops._io(operation="save", data_loc=loc, name="upsert", data=partial)
+        compare = ops._io(operation="update", data_loc=loc, name="upsert")
+        assert np.allclose(compare.values, partial.values)
+        assert compare.index.equals(partial.index)
+        ops._io(operation="save", data_loc=loc, name="shorter",
+                data=data.iloc[:24])
+        for shorter in [data.iloc[12:24], data.iloc[:12], data.iloc[6:18]]:
+            ops._io(operation="save", data_loc=loc, name="shorter",
+                    data=shorter)
+            compare = ops._io(operation="update", data_loc=loc,
+                              name="shorter")
+            assert np.allclose(compare.values, shorter.values)
+            assert compare.index.equals(shorter.index)
+        other = revised.iloc[:, :2]
+        ops._io(operation="save", data_loc=loc, name="upsert", data=other)
+        compare = ops._io(operation="update", data_loc=loc, name="upsert")
+        assert compare.shape == other.shape
+    with pytest.raises(ValueError):
+        ops._io(operation="save", data_loc=tmp_path, name="upsert",
+                data=data, mode="wrong")
+
+    reads = []
+
+    def recorder(function):
+        def wrapper(*args, **kwargs):
+            reads.append(kwargs.get("sql", args[0] if args else None))
+            return function(*args, **kwargs)
+        return wrapper
+
+    datasets = cache.DatasetCache()
+    for loc in [tmp_path, con]:
+        ops._io(operation="save", data_loc=loc, name="cached",
+                data=data.iloc[:300])
+        with datasets.activate():
+            ops._io(operation="update", data_loc=loc, name="cached")
+            if loc == tmp_path:
+                # Written behind the cache's back
+                data.iloc[:200].to_csv(tmp_path / "cached.csv")
+            with monkeypatch.context() as patch:
+                patch.setattr(pd, "read_sql", recorder(pd.read_sql))
+                ops._io(operation="save", data_loc=loc, name="cached",
+                        data=revised)
+        compare = ops._io(operation="update", data_loc=loc, name="cached")
+        assert np.allclose(compare.values, revised.values)
+        assert compare.index.equals(revised.index)
+    assert all(str(x) == "cached_metadata" for x in reads)
+
+
+def test_df_to_sql(caplog):
+    caplog.set_level("INFO", logger="econuy.utils.sqlutil")
+    con = create_engine("sqlite://").connect()
+    data = ops._io(operation="update", data_loc=TEST_DIR, name="reserves_chg")
+    for method in ["auto", "multi", "copy", None]:
+        caplog.clear()
+        sqlutil.df_to_sql(data, name=f"bulk_{method}", con=con,
+                          chunksize=500, method=method)
+        compare = sqlutil.read(con=con, table_name=f"bulk_{method}")
+        assert np.allclose(compare.values, data.values, equal_nan=True)
+        assert compare.index.equals(data.index)
+        assert f"Wrote {len(data)} rows to 'bulk_{method}'" in caplog.text
+    with pytest.raises(ValueError):
+        sqlutil.df_to_sql(data, name="bulk", con=con, method="wrong")
+
+
+def test_long_layout():
+    con = create_engine("sqlite://").connect()
+    data = ops._io(operation="update", data_loc=TEST_DIR, name="reserves_chg")
+    sqlutil.df_to_sql(data, name="reserves_chg", con=con, layout="long")
+    assert sqlutil._layout(con, "reserves_chg") == "long"
+    compare = sqlutil.read(con=con, table_name="reserves_chg")
+    assert np.allclose(compare.values, data.values, equal_nan=True)
+    assert compare.index.equals(data.index)
+    assert compare.columns.equals(data.columns)
+    col = data.columns.get_level_values(0)[3]
+    compare = ops.load(con, name="reserves_chg", cols=col,
+                       start="2015-03-01", end="2015-06-30")
+    expected = data.loc["2015-03-01":"2015-06-30"].iloc[:, [3]]
+    assert np.allclose(compare.values, expected.values, equal_nan=True)
+    assert compare.index.equals(expected.index)
+    ids = con.execute("SELECT series_id FROM econuy_series").fetchall()
+    rows = con.execute("SELECT COUNT(*) FROM econuy_observations").scalar()
+    extra = data.iloc[:, [0]] * 2
+    extra.columns = pd.MultiIndex.from_tuples(
+        [("Nueva",) + data.columns[0][1:]], names=data.columns.names)
+    ops._io(operation="save", data_loc=con, name="reserves_chg",
+            data=pd.concat([data, extra], axis=1))
+    assert "reserves_chg" not in sqlutil.sqla.inspect(con).get_table_names()
+    assert set(ids) < set(
+        con.execute("SELECT series_id FROM econuy_series").fetchall())
+    assert (con.execute("SELECT COUNT(*) FROM econuy_observations").scalar()
+            == rows + len(data))
+    compare = ops._io(operation="update", data_loc=con, name="reserves_chg")
+    assert compare.shape == (len(data), data.shape[1] + 1)
+    assert np.allclose(compare.iloc[:, -1], extra.iloc[:, 0], equal_nan=True)
+    sqlutil.df_to_sql(data, name="reserves_chg", con=con, layout="wide")
+    assert sqlutil._layout(con, "reserves_chg") == "wide"
+    assert con.execute("SELECT COUNT(*) FROM econuy_series").scalar() == 0
+    with pytest.raises(ValueError):
+        sqlutil.df_to_sql(data, name="reserves_chg", con=con, layout="wrong")
+
+
+def test_insert_csvs(tmp_path, caplog):
+    caplog.set_level("INFO", logger="econuy.utils.sqlutil")
+    data = ops._io(operation="update", data_loc=TEST_DIR, name="reserves_chg")
+    data.to_csv(tmp_path / "multi.csv")
+    data.droplevel(list(range(1, 9)), axis=1).to_csv(tmp_path / "flat.csv")
+    for executor in ["thread", "process", None]:
+        caplog.clear()
+        con = create_engine("sqlite://").connect()
+        sqlutil.insert_csvs(con, tmp_path, executor=executor, max_workers=2)
+        multi = sqlutil.read(con=con, table_name="multi")
+        assert multi.columns.nlevels == 9
+        assert np.allclose(multi.values, data.values, equal_nan=True)
+        flat = ops._load(con, multiindex=False, table_name="flat",
+                         index_label="index")
+        assert np.allclose(flat.values, data.values, equal_nan=True)
+        assert "Inserted 'flat.csv'" in caplog.text
+        assert "Inserted 'multi.csv'" in caplog.text
+
+
+def test_dataset_cache_lru():
+    datasets = cache.DatasetCache(max_entries=2)
+    data = pd.DataFrame({"a": [1, 2]})
+    for name in ["x", "y", "z"]:
+        datasets.put((name, "loc"), data)
+    assert len(datasets) == 2
+    assert datasets.get(("x", "loc")) is None
+    compare = datasets.get(("y", "loc"))
+    compare.iloc[0, 0] = 10
+    assert datasets.get(("y", "loc")).equals(data)
+    datasets.invalidate("y", "loc")
+    assert datasets.get(("y", "loc")) is None
+    assert (datasets.hits, datasets.misses) == (2, 2)
+    with datasets.activate():
+        assert cache.active() is datasets
+        assert parallel._map(lambda x: cache.active(), [1, 2],
+                             executor="thread") == [datasets, datasets]
+    assert cache.active() is None
+
+
+def _baseline_set(columns, inferred_freq, overrides):
+    """Build metadata columns from tuples, as before codes and levels."""
+    arrays = [list(columns.get_level_values(level)) for level in range(9)]
+    arrays[2] = [inferred_freq] * len(columns)
+    for level, value in overrides.items():
+        arrays[level] = [value] * len(columns)
+    try:
+        arrays[8] = list(map(int, arrays[8]))
+    except ValueError:
+        pass
+    return pd.MultiIndex.from_tuples(list(zip(*arrays)), names=columns.names)
+
+
+def test_set_metadata():
+    index = pd.date_range("2000-01-31", periods=240, freq="M")
+    data = pd.DataFrame(np.random.rand(240, 300), index=index,
+                        columns=[f"Serie {i}" for i in range(300)])
+    metadata._set(data, area="Comercio", currency="USD", inf_adj="No",
+                  unit="Millones", seas_adj="NSA", ts_type="Flujo",
+                  cumperiods=1)
+    assert list(data.columns[0]) == ["Serie 0", "Comercio", "M", "USD",
+                                     "No", "Millones", "NSA", "Flujo", 1]
+    subset = data.iloc[:, 10:20].copy()
+    subset.columns = pd.MultiIndex.from_tuples(
+        [column[:8] + ("12",) for column in subset.columns],
+        names=data.columns.names)
+    mixed = data.iloc[:, 20:30].copy()
+    mixed.columns = pd.MultiIndex.from_tuples(
+        [column[:7] + (ts_type, cumperiods) for column, ts_type, cumperiods
+         in zip(mixed.columns, ["Stock", "Flujo"] * 5, ["3", 1] * 5)],
+        names=data.columns.names)
+    cases = [(data, {"currency": "UYU"}, {3: "UYU"}),
+             (subset, {"currency": "UYU"}, {3: "UYU"}),
+             (mixed, {"unit": "Miles"}, {5: "Miles"}),
+             (mixed, {"cumperiods": 2}, {8: 2})]
+    for table, kwargs, overrides in cases:
+        table = table.copy()
+        expected = _baseline_set(table.columns, "M", overrides)
+        metadata._set(table, **kwargs)
+        assert table.columns.equals(expected)
+        assert table.columns.names == expected.names
+        assert list(table.columns) == list(expected)
+        for level in range(9):
+            assert (table.columns.get_level_values(level)
+                    .equals(expected.get_level_values(level)))
+
+
+def test_registry():
+    assert registry.lookup("nxr_m") is registry.lookup("nxr_monthly")
+    assert registry.lookup("wages").function == "get_wages"
+    assert (registry.lookup("wages", group="frequent").function
+            == "labor_real_wages")
+    assert registry.lookup("prices").fetcher() is cpi.get
+    assert "rxr_custom" in registry.available(group="get")
+    assert "rxr_custom" not in registry.available(group="frequent")
+    names = registry.available()
+    assert len(names) == len(set(names))
+    assert names.index("fiscal") < names.index("cpi_measures")
+    assert "tot" in names
+    for dataset in registry.DATASETS:
+        assert callable(dataset.fetcher())
+        for dependency in dataset.dependencies:
+            registry.lookup(dependency)
+    assert registry._waves(["rxr-custom", "trade"]) == [
+        ["cpi", "nxr_monthly", "trade"], ["rxr_custom"]]
+    with pytest.raises(ValueError):
+        registry.lookup("cpi_measures")
+
+
+def test_lazy_imports():
+    heavy = ["statsmodels", "scipy", "bs4", "patoolib", "requests",
+             "econuy.frequent", "econuy.retrieval.rxr",
+             "econuy.retrieval.fiscal_accounts"]
+    code = ("import sys; from econuy import Session; "
+            f"print([x for x in {heavy!r} if x in sys.modules])")
+    output = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True,
+                            cwd=path.dirname(CUR_DIR)).stdout
+    assert output.strip() == "[]"
+    code = ("import sys; import econuy.utils.sqlutil; "
+            "print('econuy.session' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True,
+                            cwd=path.dirname(CUR_DIR)).stdout
+    assert output.strip() == "False"
+
+
 def test_sources():
     source_1 = _get_sources("tfm_labor_test")
     source_2 = _get_sources("tfm_labor")
     assert source_1 == source_2
+
+
+def test_rate_limiter():
+    limiter = parallel._RateLimiter(calls_per_second=50)
+    start = time.monotonic()
+    parallel._map(lambda x: limiter.wait(), range(10), executor="thread",
+                  max_workers=5)
+    assert time.monotonic() - start >= 9 / 50
+
+
+def test_run_tasks():
+    tasks = {"slow": lambda: time.sleep(0.2) or "a",
+             "fast": lambda: "b",
+             "other": lambda: time.sleep(0.2) or "c"}
+    start = time.monotonic()
+    results = parallel._run_tasks(tasks, max_workers=3)
+    assert time.monotonic() - start < 0.4
+    assert list(results.keys()) == ["slow", "fast", "other"]
+    assert list(results.values()) == ["a", "b", "c"]